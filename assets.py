@@ -0,0 +1,98 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend", "external")
+_COMPRESSIBLE = (".css", ".js", ".html", ".svg", ".ttf", ".otf", ".json", ".txt")
+_HASHED_RE = re.compile(r"^(.*)\.([0-9a-f]{12})(\.[^./]+)$")
+_REF_RE = re.compile(r"/external/([\w./-]+)")
+_CSS_URL_RE = re.compile(r"url\(([^)'\"]+)\)")
+
+class Asset:
+    def __init__(self, body, content_type, compress=True):
+        self.body = body
+        self.content_type = content_type
+        self.hash = hashlib.sha256(body).hexdigest()[:12]
+        self.gzip = None
+        self.br = None
+        if compress and len(body) > 512:
+            gz = gzip.compress(body, 9, mtime=0)
+            if len(gz) < len(body):
+                self.gzip = gz
+            if brotli is not None:
+                br = brotli.compress(body)
+                if len(br) < len(body):
+                    self.br = br
+
+_assets = {}
+_urls = {}
+
+def _load():
+    files = []
+    for root, _, names in os.walk(_DIR):
+        for n in names:
+            files.append(os.path.relpath(os.path.join(root, n), _DIR).replace(os.sep, "/"))
+    for rel in sorted(files, key=lambda r: r.endswith(".css")):
+        with open(os.path.join(_DIR, rel), "rb") as f:
+            body = f.read()
+        if rel.endswith(".css"):
+            base = os.path.dirname(rel)
+            def _sub(m):
+                target = os.path.normpath(os.path.join(base, m.group(1))).replace(os.sep, "/")
+                url = _urls.get(target)
+                return f"url({os.path.relpath(url[len('/external/'):], base or '.')})" if url else m.group(0)
+            body = _CSS_URL_RE.sub(_sub, body.decode()).encode()
+        ctype = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+        if ctype.startswith("text/"):
+            ctype += "; charset=utf-8"
+        asset = Asset(body, ctype, rel.endswith(_COMPRESSIBLE))
+        stem, ext = os.path.splitext(rel)
+        _assets[rel] = asset
+        _urls[rel] = f"/external/{stem}.{asset.hash}{ext}"
+
+def url(rel):
+    if not _urls:
+        _load()
+    return _urls.get(rel, f"/external/{rel}")
+
+def rewrite(html):
+    return _REF_RE.sub(lambda m: url(m.group(1)), html)
+
+def respond(asset, immutable=False):
+    accept = request.headers.get("Accept-Encoding", "")
+    body, encoding = asset.body, None
+    if asset.br is not None and "br" in accept:
+        body, encoding = asset.br, "br"
+    elif asset.gzip is not None and "gzip" in accept:
+        body, encoding = asset.gzip, "gzip"
+    etag = f'"{asset.hash}-{encoding}"' if encoding else f'"{asset.hash}"'
+    headers = {"ETag": etag, "Vary": "Accept-Encoding",
+        "Cache-Control": "public, max-age=31536000, immutable" if immutable else "no-cache"}
+    if etag in [t.strip() for t in request.headers.get("If-None-Match", "").split(",")]:
+        return Response(status=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, content_type=asset.content_type, headers=headers)
+
+def serve(filename):
+    if not _urls:
+        _load()
+    m = _HASHED_RE.match(filename)
+    if m and f"{m.group(1)}{m.group(3)}" in _assets:
+        asset = _assets[f"{m.group(1)}{m.group(3)}"]
+        return respond(asset, immutable=asset.hash == m.group(2))
+    asset = _assets.get(filename)
+    if asset is None:
+        return None
+    return respond(asset)
+
+def page(html):
+    return Asset(html.encode(), "text/html; charset=utf-8")
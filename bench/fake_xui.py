@@ -0,0 +1,153 @@
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+_STREAMS = [
+    {"network": "tcp", "security": "reality", "realitySettings": {"serverNames": ["www.example.com"], "shortIds": ["ab12"], "settings": {"publicKey": "pbk", "fingerprint": "chrome"}}},
+    {"network": "ws", "security": "tls", "wsSettings": {"path": "/ws", "host": "cdn.example.com"}, "tlsSettings": {"serverName": "cdn.example.com", "alpn": ["h2", "http/1.1"]}},
+    {"network": "grpc", "security": "none", "grpcSettings": {"serviceName": "gg"}},
+]
+
+_ROUTES = [
+    ("POST", re.compile(r"^/login$"), "login"),
+    ("GET", re.compile(r"^/panel/api/inbounds/get/(\d+)$"), "get"),
+    ("POST", re.compile(r"^/panel/api/inbounds/addClient$"), "addClient"),
+    ("POST", re.compile(r"^/panel/api/inbounds/updateClient/([^/]+)$"), "updateClient"),
+    ("POST", re.compile(r"^/panel/api/inbounds/(\d+)/delClient/([^/]+)$"), "delClient"),
+    ("GET", re.compile(r"^/panel/api/inbounds/getClientTraffics/([^/]+)$"), "getClientTraffics"),
+    ("POST", re.compile(r"^/panel/api/inbounds/(\d+)/resetClientTraffic/([^/]+)$"), "resetClientTraffic"),
+    ("POST", re.compile(r"^/panel/api/(?:server|inbounds)/restartXray\w*$"), "restartXray"),
+]
+
+class FakeXUI:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, inbounds=(1,), protocol="vless"):
+        self.latency = latency
+        self.jitter = jitter
+        self.counts = {}
+        self.inbounds = {}
+        self.traffic = {}
+        self._lock = threading.Lock()
+        for i, iid in enumerate(inbounds):
+            self.inbounds[int(iid)] = {"id": int(iid), "protocol": protocol, "port": 443 + i, "streamSettings": _STREAMS[i % len(_STREAMS)], "clients": []}
+        fake = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *a):
+                pass
+
+            def _handle(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+                status, payload = fake._dispatch(method, self.path, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if self.path == "/login":
+                    self.send_header("Set-Cookie", "3x-ui=bench; Path=/")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts.clear()
+
+    def add_clients(self, inbound_id, clients, traffic=True):
+        with self._lock:
+            self.inbounds[int(inbound_id)]["clients"].extend(clients)
+            if traffic:
+                for c in clients:
+                    self.traffic[c["email"]] = {"up": random.randint(0, 1 << 30), "down": random.randint(0, 4 << 30)}
+
+    def _inbound_obj(self, ib):
+        settings = {"clients": ib["clients"], "decryption": "none"}
+        return {"id": ib["id"], "protocol": ib["protocol"], "port": ib["port"], "enable": True, "remark": f"bench-{ib['id']}",
+            "settings": json.dumps(settings), "streamSettings": json.dumps(ib["streamSettings"])}
+
+    def _dispatch(self, method, path, body):
+        for m, rx, op in _ROUTES:
+            match = rx.match(path)
+            if m == method and match:
+                break
+        else:
+            return 404, {"success": False, "msg": "not found"}
+        with self._lock:
+            self.counts[op] = self.counts.get(op, 0) + 1
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        with self._lock:
+            if op in ("login", "restartXray"):
+                return 200, {"success": True}
+            if op == "get":
+                ib = self.inbounds.get(int(match.group(1)))
+                return 200, ({"success": True, "obj": self._inbound_obj(ib)} if ib else {"success": False})
+            if op == "getClientTraffics":
+                t = self.traffic.get(match.group(1))
+                return 200, ({"success": True, "obj": {"email": match.group(1), **t}} if t else {"success": False})
+            if op == "resetClientTraffic":
+                if match.group(2) in self.traffic:
+                    self.traffic[match.group(2)] = {"up": 0, "down": 0}
+                return 200, {"success": True}
+            ib = self.inbounds.get(int(body.get("id") or (match.group(1) if op == "delClient" else 0)))
+            if not ib:
+                return 200, {"success": False, "msg": "inbound not found"}
+            if op == "delClient":
+                before = len(ib["clients"])
+                ib["clients"] = [c for c in ib["clients"] if c.get("id") != match.group(2)]
+                return 200, {"success": len(ib["clients"]) != before}
+            clients = json.loads(body.get("settings") or "{}").get("clients", [])
+            if op == "addClient":
+                ib["clients"].extend(clients)
+                for c in clients:
+                    self.traffic.setdefault(c["email"], {"up": 0, "down": 0})
+                return 200, {"success": True}
+            for i, c in enumerate(ib["clients"]):
+                if c.get("id") == match.group(1) and clients:
+                    ib["clients"][i] = clients[0]
+                    return 200, {"success": True}
+            return 200, {"success": False, "msg": "client not found"}
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in 3x-ui panel for GhostGate benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2053)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--inbounds", default="1", help="comma-separated inbound ids")
+    args = parser.parse_args()
+    fake = FakeXUI(args.host, args.port, args.latency, args.jitter, [int(x) for x in args.inbounds.split(",")])
+    print(f"fake 3x-ui listening on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import json
+import uuid
+import random
+import sqlite3
+import argparse
+from datetime import datetime, timezone, timedelta
+import database as db
+
+def generate(db_path, subs=1000, node_urls=("http://127.0.0.1:2053",), inbounds_per_node=1, nodes_per_sub=None, fakes=None, seed=1):
+    rnd = random.Random(seed)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    db.DB_PATH = db_path
+    db.init_db()
+    now = datetime.now(timezone.utc)
+    c = sqlite3.connect(db_path)
+    inbounds = []
+    for n, url in enumerate(node_urls):
+        node_id = c.execute('INSERT INTO nodes (name, address, username, password, "order") VALUES (?,?,?,?,?)', (f"node-{n+1}", url, "admin", "admin", n)).lastrowid
+        for i in range(inbounds_per_node):
+            ni_id = c.execute('INSERT INTO node_inbounds (node_id, inbound_id, name, traffic_multiplier, "order") VALUES (?,?,?,?,?)', (node_id, i + 1, f"node-{n+1}-in{i+1}", 1.0, i)).lastrowid
+            inbounds.append((ni_id, n, i + 1))
+    per_sub = nodes_per_sub or len(inbounds)
+    sub_rows, sn_rows, log_rows = [], [], []
+    clients = {}
+    for k in range(subs):
+        sid = f"bench{k:015d}"
+        data_gb = rnd.choice([0, 10, 50, 100])
+        expire_at = (now + timedelta(days=rnd.randint(-5, 60))).isoformat() if rnd.random() < 0.8 else None
+        used = rnd.randint(0, int(data_gb * 1073741824 * 1.1)) if data_gb else rnd.randint(0, 1 << 34)
+        sub_rows.append((sid, f"user-{k}", None, json.dumps(rnd.sample(["vip", "trial", "team", "family"], rnd.randint(0, 2))), data_gb, 30, rnd.choice([0, 1, 2, 3]), used, expire_at, 1 if rnd.random() < 0.95 else 0))
+        client_uuid = str(uuid.UUID(int=rnd.getrandbits(128)))
+        for order, (ni_id, n, inbound_id) in enumerate(rnd.sample(inbounds, min(per_sub, len(inbounds)))):
+            email = f"{sid}-{ni_id}"
+            sn_rows.append((sid, ni_id, client_uuid, email, order))
+            clients.setdefault((n, inbound_id), []).append({"id": client_uuid, "flow": "", "email": email, "limitIp": 0, "totalGB": 0, "expiryTime": 0, "enable": True, "tgId": "", "subId": sid, "comment": ""})
+        for _ in range(rnd.randint(0, 3)):
+            log_rows.append((sid, f"10.0.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}", rnd.choice(["v2rayNG/1.8.5", "Hiddify/2.0", "Mozilla/5.0 Chrome/120", "sing-box 1.8"])))
+    c.executemany("INSERT INTO subscriptions (id, comment, note, tags, data_gb, days, ip_limit, used_bytes, expire_at, enabled) VALUES (?,?,?,?,?,?,?,?,?,?)", sub_rows)
+    c.executemany('INSERT INTO subscription_nodes (sub_id, node_id, client_uuid, email, "order") VALUES (?,?,?,?,?)', sn_rows)
+    c.executemany("INSERT OR IGNORE INTO user_agents (ua) VALUES (?)", {(r[2],) for r in log_rows})
+    c.executemany("INSERT INTO access_logs (sub_id, ip_address, ua_id) SELECT ?, ?, id FROM user_agents WHERE ua=?", log_rows)
+    c.commit()
+    c.close()
+    if fakes:
+        for (n, inbound_id), cl in clients.items():
+            fakes[n].add_clients(inbound_id, cl)
+    return [r[0] for r in sub_rows]
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic GhostGate database")
+    parser.add_argument("path")
+    parser.add_argument("--subs", type=int, default=1000, help="e.g. 1000, 10000, 100000")
+    parser.add_argument("--nodes", default="http://127.0.0.1:2053", help="comma-separated 3x-ui base URLs")
+    parser.add_argument("--inbounds", type=int, default=1, help="inbounds per node")
+    parser.add_argument("--nodes-per-sub", type=int, default=None)
+    args = parser.parse_args()
+    ids = generate(args.path, args.subs, args.nodes.split(","), args.inbounds, args.nodes_per_sub)
+    print(f"wrote {len(ids)} subscriptions to {args.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import os
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import database as db
+from bench.fake_xui import FakeXUI
+from bench.gen_db import generate
+
+PANEL_PATH = "bench"
+_BROWSER_UA = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/120 Safari/537.36"
+_CLIENT_UA = "v2rayNG/1.8.5"
+
+def _pct(vals, p):
+    if not vals:
+        return 0.0
+    vals = sorted(vals)
+    return vals[min(len(vals) - 1, int(round(p / 100 * (len(vals) - 1))))]
+
+class Report:
+    def __init__(self, fakes):
+        self.fakes = fakes
+        self.rows = []
+
+    def add(self, name, latencies, wall, counts):
+        self.rows.append((name, latencies, wall, counts))
+        n = len(latencies)
+        print(f"{name:<22} n={n:<6} wall={wall:8.3f}s  rps={n / wall if wall else 0:9.1f}  "
+            f"p50={_pct(latencies, 50)*1000:8.2f}ms  p95={_pct(latencies, 95)*1000:8.2f}ms  p99={_pct(latencies, 99)*1000:8.2f}ms  "
+            f"xui={sum(sum(c.values()) for c in counts):<7}", flush=True)
+        for i, c in enumerate(counts):
+            if c:
+                print(f"{'':<22} node-{i+1}: " + ", ".join(f"{k}={v}" for k, v in sorted(c.items())))
+
+def _measure(report, name, fn, calls, concurrency=1):
+    for f in report.fakes:
+        f.reset_counts()
+    latencies = []
+    lock = threading.Lock()
+    def _one(arg):
+        t0 = time.perf_counter()
+        fn(arg)
+        dt = time.perf_counter() - t0
+        with lock:
+            latencies.append(dt)
+    t0 = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as ex:
+            list(ex.map(_one, calls))
+    else:
+        for a in calls:
+            _one(a)
+    report.add(name, latencies, time.perf_counter() - t0, [dict(f.counts) for f in report.fakes])
+
+def scenario_sync(report, ids, args):
+    import sync
+    _measure(report, "sync._sync_once", lambda _: sync._sync_once(), range(args.cycles))
+
+def scenario_sub(report, ids, args):
+    import panel
+    client = panel.app.test_client()
+    sample = [random.choice(ids) for _ in range(args.requests)]
+    for label, ua in (("sub_page client", _CLIENT_UA), ("sub_page browser", _BROWSER_UA)):
+        _measure(report, label, lambda sid: client.get(f"/sub/{sid}", headers={"User-Agent": ua}), sample, args.concurrency)
+
+def scenario_list(report, ids, args):
+    import panel
+    client = panel.app.test_client()
+    pages = max(1, len(ids) // 20)
+    _measure(report, "api_subs_list page", lambda _: client.get(f"/{PANEL_PATH}/api/subscriptions?page={random.randint(1, pages)}&per_page=20"), range(args.requests), args.concurrency)
+    _measure(report, "api_subs_list all", lambda _: client.get(f"/{PANEL_PATH}/api/subscriptions?per_page=0"), range(max(1, args.requests // 20)))
+
+def scenario_bulk(report, ids, args):
+    import panel
+    client = panel.app.test_client()
+    batch = random.sample(ids, min(args.bulk_size, len(ids)))
+    def post(path, body):
+        job_id = client.post(f"/{PANEL_PATH}/api/bulk/{path}", json=body).json.get("job_id")
+        while job_id and client.get(f"/{PANEL_PATH}/api/jobs/{job_id}").json["status"] not in ("done", "failed"):
+            time.sleep(0.05)
+    _measure(report, "bulk toggle off", lambda _: post("toggle", {"sub_ids": batch, "enabled": False}), [0])
+    _measure(report, "bulk toggle on", lambda _: post("toggle", {"sub_ids": batch, "enabled": True}), [0])
+    _measure(report, "bulk extend days", lambda _: post("extend", {"sub_ids": batch, "days": 7}), [0])
+    _measure(report, "bulk note", lambda _: post("note", {"sub_ids": batch, "note": "bench"}), [0])
+    _measure(report, "bulk tags", lambda _: post("tags", {"sub_ids": batch, "tag": "bench", "action": "add"}), [0])
+    _measure(report, "bulk delete", lambda _: post("delete", {"sub_ids": batch}), [0])
+
+SCENARIOS = {"sync": scenario_sync, "sub": scenario_sub, "list": scenario_list, "bulk": scenario_bulk}
+
+def main():
+    parser = argparse.ArgumentParser(description="GhostGate benchmark suite against stand-in 3x-ui nodes")
+    parser.add_argument("--subs", type=int, default=1000, help="synthetic subscriptions (1000, 10000, 100000)")
+    parser.add_argument("--nodes", type=int, default=2, help="fake 3x-ui servers to start")
+    parser.add_argument("--inbounds", type=int, default=1, help="inbounds per node")
+    parser.add_argument("--nodes-per-sub", type=int, default=None)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of latency added by each fake node")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--requests", type=int, default=200, help="requests per request-level scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cycles", type=int, default=1, help="sync cycles to run")
+    parser.add_argument("--bulk-size", type=int, default=200)
+    parser.add_argument("--scenarios", default="sync,sub,list,bulk")
+    parser.add_argument("--db", default=None, help="database path (default: temporary file)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    random.seed(args.seed)
+    fakes = [FakeXUI(latency=args.latency, jitter=args.jitter, inbounds=range(1, args.inbounds + 1)).start() for _ in range(args.nodes)]
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="ghostgate-bench-"), "bench.db")
+    t0 = time.perf_counter()
+    ids = generate(db_path, args.subs, [f.url for f in fakes], args.inbounds, args.nodes_per_sub, fakes, args.seed)
+    print(f"generated {len(ids)} subs on {args.nodes} node(s) x {args.inbounds} inbound(s) in {time.perf_counter() - t0:.2f}s -> {db_path}")
+    import panel
+    panel.register_routes(PANEL_PATH)
+    report = Report(fakes)
+    try:
+        for name in args.scenarios.split(","):
+            SCENARIOS[name.strip()](report, ids, args)
+    finally:
+        for f in fakes:
+            f.stop()
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,9 @@ import html as _html
 from datetime import datetime, timezone, timedelta
 from telegram import Update
 from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
-import qrcode
 import database as db
-from xui_client import XUIClient
+import qr
+from xui_client import AsyncXUIClient, add_clients_by_node
 
 logger = logging.getLogger("bot")
 
@@ -36,14 +36,7 @@ def _parse_opts(args):
     return opts
 
 def _make_qr_bytes(text):
-    qr = qrcode.QRCode(box_size=8, border=2)
-    qr.add_data(text)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="#00e5a0", back_color="#1a1d2e")
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    return buf
+    return io.BytesIO(qr.png(text, box_size=8))
 
 def _fmt_bytes(b):
     if b < 1073741824:
@@ -58,6 +51,15 @@ def _tmult(ni):
     v = ni.get("traffic_multiplier")
     return 1.0 if v is None else float(v)
 
+async def _bg(fn, *args, **kwargs):
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+async def _find_sub(identifier):
+    return await _bg(lambda: db.get_sub(identifier) or db.get_sub_by_comment(identifier))
+
+def _xui(row):
+    return AsyncXUIClient(row["address"], row["username"], row["password"], row.get("proxy_url"))
+
 async def cmd_start(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if not _is_admin(update.effective_user.id):
         return
@@ -98,7 +100,7 @@ async def cmd_create(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     ip_limit = int(opts.get("ip", 0))
     show_multiplier = max(1, int(opts.get("show-multiplier", 1)))
     nodes_str = opts.get("nodes", "all")
-    all_inbounds = db.get_all_node_inbounds()
+    all_inbounds = await _bg(db.get_all_node_inbounds)
     if not all_inbounds:
         await update.message.reply_text("No sub-nodes configured. Add nodes and sub-nodes via the web panel first.")
         return
@@ -108,8 +110,8 @@ async def cmd_create(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         node_ids = []
     else:
         node_ids = [int(x.strip()) for x in nodes_str.split(",") if x.strip().isdigit()]
-    sub_id = db.create_sub(comment=comment, note=note, data_gb=data_gb, days=days, ip_limit=ip_limit, show_multiplier=show_multiplier, expire_after_first_use_seconds=expire_after_first_use_seconds)
-    sub = db.get_sub(sub_id)
+    sub_id = await _bg(db.create_sub, comment=comment, note=note, data_gb=data_gb, days=days, ip_limit=ip_limit, show_multiplier=show_multiplier, expire_after_first_use_seconds=expire_after_first_use_seconds)
+    sub = await _bg(db.get_sub, sub_id)
     client_uuid = str(uuid.uuid4())
     expire_ms = 0
     if sub.get("expire_at"):
@@ -118,22 +120,20 @@ async def cmd_create(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         except Exception:
             pass
     expiry_time = -expire_after_first_use_seconds*1000 if expire_after_first_use_seconds>0 and not sub.get("expire_at") else expire_ms
-    added_nodes = []
-    for node_id in node_ids:
-        ni = db.get_node_inbound_with_node(node_id)
+    items = []
+    for ni in await _bg(lambda: [db.get_node_inbound_with_node(node_id) for node_id in node_ids]):
         if not ni:
             continue
-        try:
-            xui = XUIClient(ni["address"], ni["username"], ni["password"], ni.get("proxy_url"))
-            mult = _tmult(ni)
-            total_limit_bytes = int(data_gb * 1073741824 / mult) if data_gb > 0 and mult != 0 else 0
-            email = f"{sub_id}-{node_id}"
-            client = xui.make_client(email, client_uuid, expiry_time, ip_limit, sub_id, comment or "", total_limit_bytes)
-            if xui.add_client(ni["inbound_id"], client):
-                db.add_sub_node(sub_id, node_id, client_uuid, email)
-                added_nodes.append(ni.get("inbound_name") or ni["name"])
-        except Exception as e:
-            logger.warning(f"create sub inbound {node_id} error: {e}")
+        mult = _tmult(ni)
+        total_limit_bytes = int(data_gb * 1073741824 / mult) if data_gb > 0 and mult != 0 else 0
+        items.append((ni, AsyncXUIClient.make_client(f"{sub_id}-{ni['id']}", client_uuid, expiry_time, ip_limit, sub_id, comment or "", total_limit_bytes)))
+    added_nodes = []
+    for (ni, client), ok in zip(items, await add_clients_by_node(items)):
+        if ok is True:
+            await _bg(db.add_sub_node, sub_id, ni["id"], client_uuid, client["email"])
+            added_nodes.append(ni.get("inbound_name") or ni["name"])
+        elif ok:
+            logger.warning(f"create sub inbound {ni['id']} error: {ok}")
     sub_link = _sub_url(sub_id)
     expire_str = sub["expire_at"][:10] if sub.get("expire_at") else "Never"
     data_str = f"{data_gb} GB" if data_gb > 0 else "Unlimited"
@@ -150,7 +150,7 @@ async def cmd_create(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         + f"\nLink: <tg-spoiler>{_html.escape(sub_link)}</tg-spoiler>"
     )
     await update.message.reply_text(msg, parse_mode="HTML")
-    qr_buf = _make_qr_bytes(sub_link)
+    qr_buf = await _bg(_make_qr_bytes, sub_link)
     await update.message.reply_photo(photo=qr_buf, caption=f"QR: {comment or sub_id}")
 
 async def cmd_delete(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
@@ -160,18 +160,19 @@ async def cmd_delete(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Usage: /delete <id or comment>")
         return
     identifier = " ".join(ctx.args)
-    sub = db.get_sub(identifier) or db.get_sub_by_comment(identifier)
+    sub = await _find_sub(identifier)
     if not sub:
         await update.message.reply_text("Subscription not found.")
         return
-    snodes = db.get_sub_nodes(sub["id"])
-    for sn in snodes:
+    snodes = await _bg(db.get_sub_nodes, sub["id"])
+    async def _del(sn):
         try:
-            xui = XUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url"))
-            xui.delete_client(sn["inbound_id"], sn["client_uuid"])
+            async with _xui(sn) as xui:
+                await xui.delete_client(sn["inbound_id"], sn["client_uuid"])
         except Exception:
             pass
-    db.delete_sub(sub["id"])
+    await asyncio.gather(*[_del(sn) for sn in snodes])
+    await _bg(db.delete_sub, sub["id"])
     await update.message.reply_text(f"Deleted: {sub.get('comment') or sub['id']}")
 
 async def cmd_stats(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
@@ -181,10 +182,13 @@ async def cmd_stats(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Usage: /stats <id or comment>")
         return
     identifier = " ".join(ctx.args)
-    stats = db.get_stats(identifier)
-    if not stats:
-        sub = db.get_sub_by_comment(identifier)
-        stats = db.get_stats(sub["id"]) if sub else None
+    def _load():
+        stats = db.get_stats(identifier)
+        if not stats:
+            sub = db.get_sub_by_comment(identifier)
+            stats = db.get_stats(sub["id"]) if sub else None
+        return stats
+    stats = await _bg(_load)
     if not stats:
         await update.message.reply_text("Subscription not found.")
         return
@@ -210,7 +214,7 @@ async def cmd_list(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if not _is_admin(update.effective_user.id):
         return
     page = int(ctx.args[0]) if ctx.args else 1
-    subs, total = db.get_subs(page=page, per_page=10)
+    subs, total = await _bg(db.get_subs, page=page, per_page=10)
     if not subs:
         await update.message.reply_text("No subscriptions found.")
         return
@@ -237,7 +241,7 @@ async def cmd_edit(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         all_args = ctx.args
     identifier = all_args[0]
     opts = _parse_opts(all_args[1:])
-    sub = db.get_sub(identifier) or db.get_sub_by_comment(identifier)
+    sub = await _find_sub(identifier)
     if not sub:
         await update.message.reply_text("Subscription not found.")
         return
@@ -276,8 +280,8 @@ async def cmd_edit(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
             pass
     if updates:
         if updates.get("enabled") == 1:
-            db.reset_sub_node_disabled(sub["id"])
-        db.update_sub(sub["id"], **updates)
+            await _bg(db.reset_sub_node_disabled, sub["id"])
+        await _bg(db.update_sub, sub["id"], **updates)
     await update.message.reply_text(f"Updated: {sub.get('comment') or sub['id']}")
 
 async def cmd_addnode(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
@@ -298,8 +302,8 @@ async def cmd_addnode(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if not all([name, addr, user, pwd]):
         await update.message.reply_text("Usage: /addnode --name X --addr http://host:port --user X --pass X --inbound N [--proxy http://...] [--multiplier N]")
         return
-    node_id = db.add_node(name, addr, user, pwd, proxy)
-    ni_id = db.add_node_inbound(node_id, inbound, name, multiplier)
+    node_id = await _bg(db.add_node, name, addr, user, pwd, proxy)
+    ni_id = await _bg(db.add_node_inbound, node_id, inbound, name, multiplier)
     mult_str = f" ×{multiplier:g}" if multiplier != 1.0 else ""
     await update.message.reply_text(f"Node added: [{node_id}] {name}{mult_str}\n{addr} — sub-node [{ni_id}] inbound {inbound}")
 
@@ -314,11 +318,11 @@ async def cmd_delnode(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     except ValueError:
         await update.message.reply_text("Node ID must be a number.")
         return
-    node = db.get_node(node_id)
+    node = await _bg(db.get_node, node_id)
     if not node:
         await update.message.reply_text("Node not found.")
         return
-    db.delete_node(node_id)
+    await _bg(db.delete_node, node_id)
     await update.message.reply_text(f"Deleted node: [{node_id}] {node['name']}")
 
 async def cmd_editnode(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
@@ -336,7 +340,7 @@ async def cmd_editnode(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     except ValueError:
         await update.message.reply_text("Node ID must be a number.")
         return
-    node = db.get_node(node_id)
+    node = await _bg(db.get_node, node_id)
     if not node:
         await update.message.reply_text("Node not found.")
         return
@@ -352,14 +356,11 @@ async def cmd_editnode(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if not updates:
         await update.message.reply_text("No valid changes provided.")
         return
-    db.update_node(node_id, **updates)
+    await _bg(db.update_node, node_id, **updates)
     if "enabled" in updates:
         from panel import _disable_node_clients, _enable_node_clients
-        if updates["enabled"]:
-            _enable_node_clients(node_id)
-        else:
-            _disable_node_clients(node_id)
-    updated = db.get_node(node_id)
+        await _bg(_enable_node_clients if updates["enabled"] else _disable_node_clients, node_id)
+    updated = await _bg(db.get_node, node_id)
     st = "on" if updated and updated.get("enabled") else "off"
     await update.message.reply_text(f"Updated node: [{node_id}] {updated['name']} ({st})")
 
@@ -384,13 +385,13 @@ async def cmd_addsubnode(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if node_id<=0 or inbound_id<=0:
         await update.message.reply_text("Node ID and inbound ID must be greater than 0.")
         return
-    node=db.get_node(node_id)
+    node=await _bg(db.get_node,node_id)
     if not node:
         await update.message.reply_text("Node not found.")
         return
     try:
-        xui=XUIClient(node["address"],node["username"],node["password"],node.get("proxy_url"))
-        inbound=xui.get_inbound(inbound_id)
+        async with _xui(node) as xui:
+            inbound=await xui.get_inbound(inbound_id)
         proto=(inbound.get("protocol") or "").lower() if inbound else ""
         if proto not in ("vless","vmess"):
             await update.message.reply_text(f"Unsupported protocol '{proto}': only vless and vmess are supported.")
@@ -398,7 +399,7 @@ async def cmd_addsubnode(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         await update.message.reply_text(f"Failed to verify inbound: {e}")
         return
-    ni_id=db.add_node_inbound(node_id,inbound_id,opts.get("name"),multiplier)
+    ni_id=await _bg(db.add_node_inbound,node_id,inbound_id,opts.get("name"),multiplier)
     mult_str=f" ×{multiplier:g}" if multiplier!=1.0 else ""
     label=opts.get("name") or f"Inbound {inbound_id}"
     await update.message.reply_text(f"Sub-node added: [{ni_id}] {label}{mult_str}\nNode: [{node_id}] {node['name']}")
@@ -414,11 +415,11 @@ async def cmd_delsubnode(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     except ValueError:
         await update.message.reply_text("Sub-node ID must be a number.")
         return
-    ni=db.get_node_inbound_with_node(ni_id)
+    ni=await _bg(db.get_node_inbound_with_node,ni_id)
     if not ni:
         await update.message.reply_text("Sub-node not found.")
         return
-    db.delete_node_inbound(ni_id)
+    await _bg(db.delete_node_inbound,ni_id)
     await update.message.reply_text(f"Deleted sub-node: [{ni_id}] {ni.get('inbound_name') or ni['name']} (inbound {ni['inbound_id']})")
 
 async def cmd_editsubnode(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
@@ -436,23 +437,23 @@ async def cmd_editsubnode(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     except ValueError:
         await update.message.reply_text("Sub-node ID must be a number.")
         return
-    ni=db.get_node_inbound(ni_id)
+    ni=await _bg(db.get_node_inbound,ni_id)
     if not ni:
         await update.message.reply_text("Sub-node not found.")
         return
     opts=_parse_opts(all_args[1:])
     if "move-up" in opts or "move-down" in opts:
-        inbounds = db.get_node_inbounds(ni.get("node_id"))
+        inbounds = await _bg(db.get_node_inbounds, ni.get("node_id"))
         ids = [n["id"] for n in inbounds]
         if ni_id in ids:
             idx = ids.index(ni_id)
             if "move-up" in opts and idx > 0:
                 ids[idx], ids[idx-1] = ids[idx-1], ids[idx]
-                db.reorder_node_inbounds(ni.get("node_id"), ids)
+                await _bg(db.reorder_node_inbounds, ni.get("node_id"), ids)
                 await update.message.reply_text(f"Moved sub-node [{ni_id}] up.")
             elif "move-down" in opts and idx < len(ids)-1:
                 ids[idx], ids[idx+1] = ids[idx+1], ids[idx]
-                db.reorder_node_inbounds(ni.get("node_id"), ids)
+                await _bg(db.reorder_node_inbounds, ni.get("node_id"), ids)
                 await update.message.reply_text(f"Moved sub-node [{ni_id}] down.")
             else:
                 await update.message.reply_text("Already at boundary.")
@@ -479,18 +480,15 @@ async def cmd_editsubnode(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if not updates:
         await update.message.reply_text("No valid changes provided.")
         return
-    db.update_node_inbound(ni_id,**updates)
+    await _bg(db.update_node_inbound,ni_id,**updates)
     if "traffic_multiplier" in updates and abs(updates["traffic_multiplier"]-_tmult(ni))>0.001:
         from panel import _checkpoint_subnode_traffic, _refresh_subnode_client_limits
-        _checkpoint_subnode_traffic(ni_id, _tmult(ni))
-        _refresh_subnode_client_limits(ni_id)
+        await _bg(_checkpoint_subnode_traffic, ni_id, _tmult(ni))
+        await _bg(_refresh_subnode_client_limits, ni_id)
     if "enabled" in updates:
         from panel import _disable_subnode_clients, _enable_subnode_clients
-        if updates["enabled"]:
-            _enable_subnode_clients(ni_id)
-        else:
-            _disable_subnode_clients(ni_id)
-    updated=db.get_node_inbound_with_node(ni_id)
+        await _bg(_enable_subnode_clients if updates["enabled"] else _disable_subnode_clients, ni_id)
+    updated=await _bg(db.get_node_inbound_with_node,ni_id)
     st="on" if updated and updated.get("inbound_enabled") else "off"
     mult=_tmult(updated or ni)
     mult_str=f" ×{mult:g}" if mult!=1.0 else ""
@@ -507,11 +505,11 @@ async def cmd_subnodes(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         except ValueError:
             await update.message.reply_text("Usage: /subnodes [node_id]")
             return
-        node=db.get_node(node_id)
+        node=await _bg(db.get_node,node_id)
         if not node:
             await update.message.reply_text("Node not found.")
             return
-        inbounds=db.get_node_inbounds(node_id)
+        inbounds=await _bg(db.get_node_inbounds,node_id)
         if not inbounds:
             await update.message.reply_text(f"No sub-nodes for node [{node_id}] {node['name']}.")
             return
@@ -523,14 +521,13 @@ async def cmd_subnodes(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
             lines.append(f"[{ni['id']}] {ni['name'] or 'Inbound '+str(ni['inbound_id'])} — ID:{ni['inbound_id']}{mult_str} ({ni_status})")
         await update.message.reply_text("\n".join(lines))
         return
-    nodes=db.get_nodes()
+    nodes=await _bg(lambda: [(n, db.get_node_inbounds(n["id"])) for n in db.get_nodes()])
     if not nodes:
         await update.message.reply_text("No nodes configured.")
         return
     lines=["Sub-nodes:\n"]
     has_any=False
-    for n in nodes:
-        inbounds=db.get_node_inbounds(n["id"])
+    for n, inbounds in nodes:
         if not inbounds:
             continue
         has_any=True
@@ -553,23 +550,24 @@ async def cmd_regen(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         return
     from nanoid import generate
     identifier = " ".join(ctx.args)
-    sub = db.get_sub(identifier) or db.get_sub_by_comment(identifier)
+    sub = await _find_sub(identifier)
     if not sub:
         await update.message.reply_text("Subscription not found.")
         return
     new_id = generate(size=20)
-    snodes = db.get_sub_nodes(sub["id"])
-    for sn in snodes:
+    snodes = await _bg(db.get_sub_nodes, sub["id"])
+    async def _rename(sn):
         try:
-            xui = XUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url"))
-            xui.update_client_email_subid(sn["inbound_id"], sn["client_uuid"], sn["email"], f"{new_id}-{sn['node_id']}", new_id)
+            async with _xui(sn) as xui:
+                await xui.update_client_email_subid(sn["inbound_id"], sn["client_uuid"], sn["email"], f"{new_id}-{sn['node_id']}", new_id)
         except Exception:
             pass
-    db.rename_sub(sub["id"], new_id)
+    await asyncio.gather(*[_rename(sn) for sn in snodes])
+    await _bg(db.rename_sub, sub["id"], new_id)
     new_link = _sub_url(new_id)
     msg = (f"ID Regenerated\n\nOld: <tg-spoiler>{_html.escape(sub['id'])}</tg-spoiler>\nNew: <tg-spoiler>{_html.escape(new_id)}</tg-spoiler>\nLink: <tg-spoiler>{_html.escape(new_link)}</tg-spoiler>")
     await update.message.reply_text(msg, parse_mode="HTML")
-    qr_buf = _make_qr_bytes(new_link)
+    qr_buf = await _bg(_make_qr_bytes, new_link)
     await update.message.reply_photo(photo=qr_buf, caption=f"QR: {sub.get('comment') or new_id}")
 
 async def cmd_reguuid(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
@@ -579,22 +577,22 @@ async def cmd_reguuid(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Usage: /reguuid <id or comment>")
         return
     identifier=" ".join(ctx.args)
-    sub=db.get_sub(identifier) or db.get_sub_by_comment(identifier)
+    sub=await _find_sub(identifier)
     if not sub:
         await update.message.reply_text("Subscription not found.")
         return
     new_uuid=str(uuid.uuid4())
-    errors=[]
-    for sn in db.get_sub_nodes(sub["id"]):
+    async def _rotate(sn):
         try:
-            xui=XUIClient(sn["address"],sn["username"],sn["password"],sn.get("proxy_url"))
-            ok=xui.rotate_client_uuid(sn["inbound_id"],sn["client_uuid"],sn["email"],new_uuid)
+            async with _xui(sn) as xui:
+                ok=await xui.rotate_client_uuid(sn["inbound_id"],sn["client_uuid"],sn["email"],new_uuid)
             if ok:
-                db.update_sub_node_uuid(sub["id"],sn["node_id"],new_uuid)
+                await _bg(db.update_sub_node_uuid,sub["id"],sn["node_id"],new_uuid)
             else:
-                errors.append(f"node {sn['node_id']}: failed")
+                return f"node {sn['node_id']}: failed"
         except Exception as e:
-            errors.append(f"node {sn['node_id']}: {e}")
+            return f"node {sn['node_id']}: {e}"
+    errors=[e for e in await asyncio.gather(*[_rotate(sn) for sn in await _bg(db.get_sub_nodes,sub["id"])]) if e]
     msg=f"UUID Regenerated\n\n<tg-spoiler>{_html.escape(new_uuid)}</tg-spoiler>"
     if errors:
         msg+=f"\n\nErrors: {_html.escape(', '.join(errors))}"
@@ -607,17 +605,18 @@ async def cmd_resettraffic(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Usage: /resettraffic <id or comment>")
         return
     identifier=" ".join(ctx.args)
-    sub=db.get_sub(identifier) or db.get_sub_by_comment(identifier)
+    sub=await _find_sub(identifier)
     if not sub:
         await update.message.reply_text("Subscription not found.")
         return
-    for sn in db.get_sub_nodes(sub["id"]):
+    async def _reset(sn):
         try:
-            xui=XUIClient(sn["address"],sn["username"],sn["password"],sn.get("proxy_url"))
-            xui.reset_client_traffic(sn["inbound_id"],sn["email"])
+            async with _xui(sn) as xui:
+                await xui.reset_client_traffic(sn["inbound_id"],sn["email"])
         except Exception:
             pass
-    db.reset_sub_traffic(sub["id"])
+    await asyncio.gather(*[_reset(sn) for sn in await _bg(db.get_sub_nodes,sub["id"])])
+    await _bg(db.reset_sub_traffic,sub["id"])
     await update.message.reply_text(f"Traffic reset: {_html.escape(sub.get('comment') or sub['id'])}",parse_mode="HTML")
 
 async def cmd_configs(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
@@ -627,12 +626,12 @@ async def cmd_configs(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Usage: /configs <id or comment>")
         return
     identifier = " ".join(ctx.args)
-    sub = db.get_sub(identifier) or db.get_sub_by_comment(identifier)
+    sub = await _find_sub(identifier)
     if not sub:
         await update.message.reply_text("Subscription not found.")
         return
     from panel import _build_sub_configs
-    configs = _build_sub_configs(sub["id"])
+    configs = await _bg(_build_sub_configs, sub["id"])
     if not configs:
         await update.message.reply_text("No configs available for this subscription.")
         return
@@ -642,15 +641,15 @@ async def cmd_configs(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 async def cmd_nodes(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if not _is_admin(update.effective_user.id):
         return
-    nodes = db.get_nodes()
+    nodes = await _bg(lambda: [(n, db.get_node_inbounds(n["id"])) for n in db.get_nodes()])
     if not nodes:
         await update.message.reply_text("No nodes configured.")
         return
     lines = ["Nodes:\n"]
-    for n in nodes:
+    for n, inbounds in nodes:
         status = "on" if n["enabled"] else "off"
         lines.append(f"[{n['id']}] {n['name']} — {n['address']} ({status})")
-        for ni in db.get_node_inbounds(n["id"]):
+        for ni in inbounds:
             ni_status = "on" if ni["enabled"] else "off"
             mult = _tmult(ni)
             mult_str = f" ×{mult:g}" if mult != 1.0 else ""
@@ -689,6 +688,7 @@ def _build_app():
     builder = (builder
         .connect_timeout(10).read_timeout(15).write_timeout(15).pool_timeout(5)
         .get_updates_connect_timeout(10).get_updates_read_timeout(35).get_updates_write_timeout(15).get_updates_pool_timeout(5)
+        .concurrent_updates(int(os.getenv("BOT_CONCURRENCY", "16")))
         .post_init(_post_init))
     if proxy:
         builder = builder.proxy(proxy).get_updates_proxy(proxy)
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+import metrics
+
+_lookups = metrics.counter("ghostgate_cache_lookups_total", "Cache lookups by cache, tier and result", ("cache", "tier", "result"))
+_coalesced = metrics.counter("ghostgate_cache_coalesced_total", "Requests that waited on an identical in-flight build instead of starting their own", ("cache",))
+
+class LRU:
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[1] < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value, ttl=None):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.time() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+class SharedCache:
+    def __init__(self, name, path, ttl, local_size=1024, local_ttl=None):
+        self.name = name
+        self.path = path
+        self.ttl = ttl
+        self.local = LRU(local_size, min(ttl, 5) if local_ttl is None else local_ttl)
+        self._tls = threading.local()
+        self._writes = 0
+
+    def _db(self):
+        c = getattr(self._tls, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=OFF")
+            c.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+            self._tls.conn = c
+        return c
+
+    def get(self, key):
+        if self.ttl <= 0:
+            return None
+        value = self.local.get(key)
+        if value is not None:
+            _lookups.inc(cache=self.name, tier="local", result="hit")
+            return value
+        try:
+            r = self._db().execute("SELECT value, expires FROM cache WHERE key=? AND expires>?", (f"{self.name}:{key}", time.time())).fetchone()
+        except sqlite3.Error:
+            r = None
+        if r is None:
+            _lookups.inc(cache=self.name, tier="shared", result="miss")
+            return None
+        _lookups.inc(cache=self.name, tier="shared", result="hit")
+        value = json.loads(r[0])
+        self.local.set(key, value, min(self.local.ttl, r[1] - time.time()))
+        return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        self.local.set(key, value)
+        try:
+            c = self._db()
+            c.execute("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?,?,?)", (f"{self.name}:{key}", json.dumps(value), time.time() + self.ttl))
+            self._writes += 1
+            if self._writes % 500 == 0:
+                c.execute("DELETE FROM cache WHERE expires<?", (time.time(),))
+        except sqlite3.Error:
+            pass
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            _coalesced.inc(cache=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+def shared(name, ttl, local_size=1024):
+    import database as db
+    path = os.getenv("CACHE_PATH") or os.path.splitext(db.DB_PATH)[0] + ".cache.db"
+    return SharedCache(name, path, ttl, local_size)
@@ -1,4 +1,5 @@
 import os
+import re
 import sys
 import uuid
 import shlex
@@ -706,6 +707,7 @@ def cmd_help(args):
         f"  [{ACC}]configs[/] [{MUTED}]<id or comment>[/]                       Show per-node config URLs for a subscription",
         f"  [{ACC}]status[/]                                      System overview",
         f"  [{ACC}]update[/]                                      Check and apply update",
+        f"  [{ACC}]loadtest[/] [{MUTED}][--url X] [--requests N | --duration S] [--concurrency N] [--browser 0.1] [--subs N | --ids a,b] [--metrics URL][/]",
     ]
     console.print(Panel("\n".join(lines), title=f"[bold white]GhostGate CLI[/]  [{MUTED}]v{updater.VERSION}[/]", border_style=DIM, padding=(0, 1)))
 
@@ -729,6 +731,130 @@ def cmd_configs(args):
         lines.append(f"  [{ACC}]{c['config']}[/]")
     console.print(Panel("\n".join(lines), title=f"[bold white]Configs: {sub.get('comment') or sub['id']}[/]", border_style=DIM, padding=(0, 1)))
 
+_LOADTEST_CLIENT_UAS = ["v2rayNG/1.8.19", "v2rayN/6.42", "Hiddify/2.5.7 (android)", "Streisand/1.6.10", "sing-box 1.8.14", "ClashMeta/1.18.1", "clash-verge/v1.7.7", "NekoBox/Android/1.3.3"]
+_LOADTEST_BROWSER_UAS = ["Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1"]
+_LOADTEST_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+def _scrape_metrics(url):
+    import requests
+    out = {}
+    try:
+        r = requests.get(url, timeout=10)
+        if r.status_code != 200:
+            return None
+    except Exception:
+        return None
+    for line in r.text.splitlines():
+        m = re.match(r"^(\w+)(\{.*\})?\s+(\S+)$", line)
+        if m:
+            out[(m.group(1), m.group(2) or "")] = float(m.group(3))
+    return out
+
+def _metric_delta(before, after, name):
+    labels = lambda s: dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', s))
+    return [(labels(k[1]), v - before.get(k, 0)) for k, v in after.items() if k[0] == name and v - before.get(k, 0)]
+
+def cmd_loadtest(args):
+    import time
+    import random
+    import threading
+    import requests
+    from concurrent.futures import ThreadPoolExecutor
+    opts = _parse_opts(args)
+    base = (opts.get("url") or f"http://{os.getenv('HOST', '127.0.0.1')}:{os.getenv('PORT', '5000')}").rstrip("/")
+    total = int(opts.get("requests", 1000))
+    concurrency = int(opts.get("concurrency", 50))
+    duration = float(opts["duration"]) if "duration" in opts else None
+    browser_ratio = float(opts.get("browser", 0.1))
+    if "ids" in opts:
+        ids = [i for i in opts["ids"].split(",") if i]
+    else:
+        subs, _ = db.get_subs(page=1, per_page=0)
+        ids = [s["id"] for s in subs]
+        if "subs" in opts:
+            ids = random.sample(ids, min(int(opts["subs"]), len(ids)))
+    if not ids:
+        console.print(f"[{DANGER}]No subscriptions to request. Use --ids or create some first.[/]")
+        return
+    metrics_url = opts.get("metrics") or (f"{base}/{os.getenv('PANEL_PATH')}/metrics" if os.getenv("PANEL_PATH") else None)
+    before = _scrape_metrics(metrics_url) if metrics_url else None
+    console.print(f"[{MUTED}]Replaying /sub traffic against[/] [{BLUE}]{base}[/]  [{MUTED}]{len(ids)} subs, concurrency {concurrency}, "
+        + (f"{duration:g}s" if duration else f"{total} requests") + f", {browser_ratio:.0%} browsers[/]")
+    lock = threading.Lock()
+    latencies, statuses = [], {}
+    local = threading.local()
+    deadline = time.perf_counter() + duration if duration else None
+    remaining = [total]
+    def _take():
+        with lock:
+            if deadline:
+                return time.perf_counter() < deadline
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+    def _worker():
+        s = getattr(local, "session", None) or requests.Session()
+        local.session = s
+        while _take():
+            ua = random.choice(_LOADTEST_BROWSER_UAS if random.random() < browser_ratio else _LOADTEST_CLIENT_UAS)
+            t0 = time.perf_counter()
+            try:
+                status = s.get(f"{base}/sub/{random.choice(ids)}", headers={"User-Agent": ua}, timeout=30).status_code
+            except Exception as e:
+                status = type(e).__name__
+            dt = time.perf_counter() - t0
+            with lock:
+                latencies.append(dt)
+                statuses[status] = statuses.get(status, 0) + 1
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as ex:
+        for f in [ex.submit(_worker) for _ in range(concurrency)]:
+            f.result()
+    wall = time.perf_counter() - t0
+    after = _scrape_metrics(metrics_url) if before is not None else None
+    n = len(latencies)
+    vals = sorted(latencies)
+    pct = lambda p: vals[min(n - 1, int(round(p / 100 * (n - 1))))] * 1000 if n else 0
+    lines = [
+        f"  [{MUTED}]Requests[/]    [bold white]{n}[/] in {wall:.2f}s  [{ACC}]{n / wall if wall else 0:.1f} req/s[/]",
+        f"  [{MUTED}]Latency[/]     p50 {pct(50):.1f}ms  p95 {pct(95):.1f}ms  p99 {pct(99):.1f}ms  max {pct(100):.1f}ms",
+        f"  [{MUTED}]Status[/]      " + "  ".join(f"[{ACC if k == 200 else DANGER}]{k}[/] ×{v}" for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))),
+        "",
+    ]
+    prev = 0
+    for le in _LOADTEST_BUCKETS + (float("inf"),):
+        count = sum(1 for v in vals if prev <= v * 1000 < le)
+        label = f"≥{prev}ms" if le == float("inf") else f"<{le}ms"
+        bar = "█" * (int(count * 40 / n) if n else 0)
+        lines.append(f"  [{MUTED}]{label:>9}[/] [{ACC}]{bar:<40}[/] {count}")
+        prev = le
+    if after is not None:
+        xui = _metric_delta(before, after, "ghostgate_xui_requests_total")
+        by_node = {}
+        for lbl, v in xui:
+            by_node.setdefault(lbl.get("node", "?"), []).append(f"{lbl.get('op')}={int(v)}" + (f" ({lbl.get('status')})" if lbl.get("status") != "ok" else ""))
+        lines.append("")
+        lines.append(f"  [{MUTED}]3x-ui calls[/] [bold white]{int(sum(v for _, v in xui))}[/]" + (f"  [{MUTED}]({sum(v for _, v in xui) / n:.2f} per request)[/]" if n else ""))
+        for node, ops in sorted(by_node.items()):
+            lines.append(f"    [{DIM}]{node}[/]  " + ", ".join(sorted(ops)))
+        db_count = {lbl.get("fn"): v for lbl, v in _metric_delta(before, after, "ghostgate_db_seconds_count")}
+        db_sum = {lbl.get("fn"): v for lbl, v in _metric_delta(before, after, "ghostgate_db_seconds_sum")}
+        commit_n = sum(v for _, v in _metric_delta(before, after, "ghostgate_db_commit_seconds_count"))
+        commit_s = sum(v for _, v in _metric_delta(before, after, "ghostgate_db_commit_seconds_sum"))
+        locked = int(sum(v for _, v in _metric_delta(before, after, "ghostgate_db_locked_total")))
+        lines.append(f"  [{MUTED}]DB calls[/]    [bold white]{int(sum(db_count.values()))}[/]  [{MUTED}]{sum(db_sum.values()):.2f}s total[/]")
+        for fn, s in sorted(db_sum.items(), key=lambda kv: kv[1], reverse=True)[:5]:
+            lines.append(f"    [{DIM}]{fn}[/]  ×{int(db_count.get(fn, 0))}  avg {s / db_count[fn] * 1000 if db_count.get(fn) else 0:.2f}ms")
+        lines.append(f"  [{MUTED}]DB commits[/]  {int(commit_n)}  [{MUTED}]avg wait+commit {commit_s / commit_n * 1000 if commit_n else 0:.2f}ms[/]"
+            + (f"  [{DANGER}]{locked} locked[/]" if locked else ""))
+    elif metrics_url:
+        lines.append(f"\n  [{WARN}]Could not read {metrics_url} — 3x-ui and DB figures unavailable[/]")
+    else:
+        lines.append(f"\n  [{WARN}]PANEL_PATH not set — pass --metrics URL for 3x-ui and DB figures[/]")
+    console.print(Panel("\n".join(lines), title="[bold white]Load test: /sub[/]", border_style=DIM, padding=(0, 1)))
+
 _COMMANDS = {
     "list": cmd_list,
     "stats": cmd_stats,
@@ -751,6 +877,7 @@ _COMMANDS = {
     "delsubnode": cmd_delsubnode,
     "bot": cmd_bot,
     "update": cmd_update,
+    "loadtest": cmd_loadtest,
     "help": cmd_help,
 }
 
@@ -0,0 +1,80 @@
+import os
+import gzip
+import hashlib
+from flask import g, request
+import metrics
+from cache import LRU
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_bytes = metrics.counter("ghostgate_compress_bytes_total", "Response bytes before and after negotiated compression", ("encoding", "stage"))
+
+_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
+_cache = LRU(int(os.getenv("COMPRESS_CACHE_SIZE", "256")), float("inf"))
+
+def _accepted(header):
+    out = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            out[name.strip().lower()] = q
+    return out
+
+def negotiate(header):
+    accepted = _accepted(header or "")
+    if zstandard is not None and accepted.get("zstd", 0) > 0:
+        return "zstd"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+def compress(body, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=_LEVEL).compress(body)
+    return gzip.compress(body, _LEVEL, mtime=0)
+
+def cache_as(key):
+    g.compress_key = key
+
+def after_request(response):
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 206, 304) or "Content-Encoding" in response.headers
+            or "accept-encoding" in response.headers.get("Vary", "").lower()
+            or not (response.mimetype or "").startswith(_TYPES)):
+        return response
+    body = response.get_data()
+    if len(body) < _MIN_BYTES:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate(request.headers.get("Accept-Encoding"))
+    if encoding is None:
+        return response
+    key = g.get("compress_key")
+    if key is not None:
+        key = f"{key}|{encoding}|{hashlib.sha1(body).hexdigest()}"
+        data = _cache.get(key)
+        if data is None:
+            data = compress(body, encoding)
+            _cache.set(key, data)
+    else:
+        data = compress(body, encoding)
+    _bytes.inc(len(body), encoding=encoding, stage="in")
+    _bytes.inc(len(data), encoding=encoding, stage="out")
+    response.set_data(data)
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
@@ -1,25 +1,124 @@
 import sqlite3
 import os
+import sys
 import json
+import hashlib
 from contextlib import contextmanager
 from datetime import datetime, timezone, timedelta
 from nanoid import generate
+import time
+import atexit
+import threading
+import metrics
+import tracing
 
 DB_PATH = os.getenv("DB_PATH", "ghostgate.db")
 
-@contextmanager
-def _conn():
-    c = sqlite3.connect(DB_PATH)
-    c.row_factory = sqlite3.Row
-    c.execute("PRAGMA journal_mode=WAL")
-    c.execute("PRAGMA foreign_keys=ON")
-    try:
-        yield c
-        c.commit()
-    finally:
-        c.close()
+_db_seconds = metrics.histogram("ghostgate_db_seconds", "Time a database helper held its connection", ("fn",))
+_db_commit = metrics.histogram("ghostgate_db_commit_seconds", "Time spent committing, including waits on the SQLite write lock")
+_db_locked = metrics.counter("ghostgate_db_locked_total", "Database helpers that failed with 'database is locked'", ("fn",))
+
+_read_only = False
+_access_buf = []
+_access_lock = threading.Lock()
+_ua_ids = {}
+_flusher = None
 
-SCHEMA_VERSION = 10
+def set_read_only(read_only=True):
+    global _read_only
+    _read_only = read_only
+
+@contextmanager
+def _conn(read_only=None):
+    fn = sys._getframe(2).f_code.co_name
+    t0 = time.perf_counter()
+    with tracing.span("db", fn):
+        if _read_only if read_only is None else read_only:
+            c = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+        else:
+            c = sqlite3.connect(DB_PATH)
+        c.row_factory = sqlite3.Row
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA foreign_keys=ON")
+        try:
+            yield c
+            if c.in_transaction:
+                with _db_commit.time():
+                    c.commit()
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e):
+                _db_locked.inc(fn=fn)
+            raise
+        finally:
+            c.close()
+            _db_seconds.observe(time.perf_counter() - t0, fn=fn)
+
+SCHEMA_VERSION = 14
+
+_SUB_FIELDS = ("id", "comment", "note", "tags", "data_gb", "days", "ip_limit", "used_bytes", "expire_at", "enabled", "show_multiplier", "expire_after_first_use_seconds")
+
+_CHANGE_LOG_SQL = f"""
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    sub_id TEXT NOT NULL,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_cl_sub ON change_log(sub_id, seq);
+CREATE TRIGGER IF NOT EXISTS trg_cl_sub_ins AFTER INSERT ON subscriptions BEGIN
+    INSERT INTO change_log(sub_id) VALUES (NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cl_sub_upd AFTER UPDATE ON subscriptions
+WHEN {" OR ".join(f"OLD.{f} IS NOT NEW.{f}" for f in _SUB_FIELDS)} BEGIN
+    INSERT INTO change_log(sub_id) SELECT OLD.id WHERE OLD.id IS NOT NEW.id;
+    INSERT INTO change_log(sub_id) VALUES (NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cl_sub_del AFTER DELETE ON subscriptions BEGIN
+    INSERT INTO change_log(sub_id) VALUES (OLD.id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cl_sn_ins AFTER INSERT ON subscription_nodes BEGIN
+    INSERT INTO change_log(sub_id) VALUES (NEW.sub_id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cl_sn_upd AFTER UPDATE ON subscription_nodes
+WHEN OLD."order" IS NOT NEW."order" OR OLD.node_id IS NOT NEW.node_id BEGIN
+    INSERT INTO change_log(sub_id) VALUES (NEW.sub_id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cl_sn_del AFTER DELETE ON subscription_nodes BEGIN
+    INSERT INTO change_log(sub_id) VALUES (OLD.sub_id);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cl_ni_name AFTER UPDATE OF name ON node_inbounds WHEN OLD.name IS NOT NEW.name BEGIN
+    INSERT INTO change_log(sub_id) SELECT sub_id FROM subscription_nodes WHERE node_id=NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_cl_node_name AFTER UPDATE OF name ON nodes WHEN OLD.name IS NOT NEW.name BEGIN
+    INSERT INTO change_log(sub_id) SELECT sn.sub_id FROM subscription_nodes sn
+    JOIN node_inbounds ni ON sn.node_id=ni.id WHERE ni.node_id=NEW.id;
+END;
+"""
+
+_GENERATION_SQL = """
+CREATE TABLE IF NOT EXISTS generations (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO generations (name, value) VALUES ('nodes', 0);
+CREATE TRIGGER IF NOT EXISTS trg_gen_node_ins AFTER INSERT ON nodes BEGIN
+    UPDATE generations SET value=value+1 WHERE name='nodes';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gen_node_upd AFTER UPDATE ON nodes BEGIN
+    UPDATE generations SET value=value+1 WHERE name='nodes';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gen_node_del AFTER DELETE ON nodes BEGIN
+    UPDATE generations SET value=value+1 WHERE name='nodes';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gen_ni_ins AFTER INSERT ON node_inbounds BEGIN
+    UPDATE generations SET value=value+1 WHERE name='nodes';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gen_ni_upd AFTER UPDATE ON node_inbounds BEGIN
+    UPDATE generations SET value=value+1 WHERE name='nodes';
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gen_ni_del AFTER DELETE ON node_inbounds BEGIN
+    UPDATE generations SET value=value+1 WHERE name='nodes';
+END;
+"""
 
 def init_db():
     with _conn() as c:
@@ -81,16 +180,41 @@ CREATE TABLE subscription_nodes (
     FOREIGN KEY (sub_id) REFERENCES subscriptions(id) ON DELETE CASCADE,
     FOREIGN KEY (node_id) REFERENCES node_inbounds(id) ON DELETE CASCADE
 );
+CREATE TABLE user_agents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ua TEXT NOT NULL UNIQUE
+);
 CREATE TABLE access_logs (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     sub_id TEXT NOT NULL,
     ip_address TEXT,
     user_agent TEXT,
+    ua_id INTEGER REFERENCES user_agents(id),
     accessed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (sub_id) REFERENCES subscriptions(id) ON DELETE CASCADE
 );
 CREATE INDEX idx_al_sub ON access_logs(sub_id);
-            """)
+CREATE TABLE jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT DEFAULT '{}',
+    status TEXT DEFAULT 'queued',
+    total INTEGER DEFAULT 0,
+    done INTEGER DEFAULT 0,
+    failed INTEGER DEFAULT 0,
+    result TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE job_items (
+    job_id TEXT NOT NULL,
+    item TEXT NOT NULL,
+    status TEXT DEFAULT 'pending',
+    error TEXT,
+    PRIMARY KEY (job_id, item),
+    FOREIGN KEY (job_id) REFERENCES jobs(id) ON DELETE CASCADE
+);
+            """ + _CHANGE_LOG_SQL + _GENERATION_SQL)
             c.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
             return
         c.executescript("""
@@ -232,6 +356,41 @@ FROM nodes n""")
             if not _col_exists("subscriptions", "traffic_preserved"):
                 c.execute("ALTER TABLE subscriptions ADD COLUMN traffic_preserved REAL DEFAULT 0")
             c.execute("PRAGMA user_version=10")
+        if user_ver < 11:
+            c.executescript("""
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT DEFAULT '{}',
+    status TEXT DEFAULT 'queued',
+    total INTEGER DEFAULT 0,
+    done INTEGER DEFAULT 0,
+    failed INTEGER DEFAULT 0,
+    result TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    item TEXT NOT NULL,
+    status TEXT DEFAULT 'pending',
+    error TEXT,
+    PRIMARY KEY (job_id, item),
+    FOREIGN KEY (job_id) REFERENCES jobs(id) ON DELETE CASCADE
+);
+            """)
+            c.execute("PRAGMA user_version=11")
+        if user_ver < 12:
+            c.executescript(_CHANGE_LOG_SQL)
+            c.execute("PRAGMA user_version=12")
+        if user_ver < 13:
+            c.execute("CREATE TABLE IF NOT EXISTS user_agents (id INTEGER PRIMARY KEY AUTOINCREMENT, ua TEXT NOT NULL UNIQUE)")
+            if not _col_exists("access_logs", "ua_id"):
+                c.execute("ALTER TABLE access_logs ADD COLUMN ua_id INTEGER REFERENCES user_agents(id)")
+            c.execute("PRAGMA user_version=13")
+        if user_ver < 14:
+            c.executescript(_GENERATION_SQL)
+            c.execute("PRAGMA user_version=14")
 
 def add_node(name, address, username, password, proxy_url=None):
     with _conn() as c:
@@ -421,6 +580,69 @@ def update_sub(sub_id, **kwargs):
     with _conn() as c:
         c.execute(f"UPDATE subscriptions SET {sets} WHERE id=?", (*fields.values(), sub_id))
 
+def _chunked(items, size=500):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def get_subs_by_ids(sub_ids):
+    out = []
+    with _conn() as c:
+        for chunk in _chunked(sub_ids):
+            rows = c.execute(f"SELECT * FROM subscriptions WHERE id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+            for r in rows:
+                d = dict(r)
+                try:
+                    d["tags"] = json.loads(d.get("tags") or "[]")
+                except Exception:
+                    d["tags"] = []
+                out.append(d)
+    return out
+
+def update_subs(rows):
+    groups = {}
+    for sub_id, fields in rows:
+        fields = {k: v for k, v in fields.items() if k in ("data_gb", "expire_at", "enabled")}
+        if fields:
+            groups.setdefault(tuple(fields), []).append((*fields.values(), sub_id))
+    with _conn() as c:
+        for keys, params in groups.items():
+            c.executemany(f"UPDATE subscriptions SET {', '.join(f'{k}=?' for k in keys)} WHERE id=?", params)
+
+def set_subs_enabled(sub_ids, enabled):
+    with _conn() as c:
+        for chunk in _chunked(sub_ids):
+            c.execute(f"UPDATE subscriptions SET enabled=? WHERE id IN ({','.join('?' * len(chunk))})", (int(enabled), *chunk))
+
+def set_subs_note(sub_ids, note):
+    with _conn() as c:
+        for chunk in _chunked(sub_ids):
+            c.execute(f"UPDATE subscriptions SET note=? WHERE id IN ({','.join('?' * len(chunk))})", (note, *chunk))
+
+def scale_subs_data(sub_ids, factor, divide=False):
+    op = "/" if divide else "*"
+    with _conn() as c:
+        for chunk in _chunked(sub_ids):
+            c.execute(f"UPDATE subscriptions SET data_gb=MAX(0, ROUND(data_gb {op} ?, 2)) "
+                f"WHERE data_gb != 0 AND id IN ({','.join('?' * len(chunk))})", (factor, *chunk))
+
+def edit_subs_tag(sub_ids, tag, action):
+    tags = "CASE WHEN json_valid(tags) AND json_type(tags)='array' THEN tags ELSE '[]' END"
+    has_tag = f"EXISTS (SELECT 1 FROM json_each({tags}) WHERE value=?)"
+    with _conn() as c:
+        for chunk in _chunked(sub_ids):
+            ids = ",".join("?" * len(chunk))
+            if action == "add":
+                c.execute(f"UPDATE subscriptions SET tags=json_insert({tags}, '$[#]', ?) WHERE id IN ({ids}) AND NOT {has_tag}", (tag, *chunk, tag))
+            else:
+                c.execute(f"UPDATE subscriptions SET tags=(SELECT json_group_array(value) FROM "
+                    f"(SELECT value FROM json_each({tags}) WHERE value != ? ORDER BY key)) WHERE id IN ({ids}) AND {has_tag}", (tag, *chunk, tag))
+
+def delete_subs(sub_ids):
+    with _conn() as c:
+        for chunk in _chunked(sub_ids):
+            c.execute(f"DELETE FROM subscriptions WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+
 def get_all_tags():
     with _conn() as c:
         rows = c.execute("SELECT tags FROM subscriptions WHERE tags IS NOT NULL AND tags != '[]' AND tags != 'null'").fetchall()
@@ -467,6 +689,68 @@ def get_sub_nodes(sub_id):
             'WHERE sn.sub_id=? ORDER BY sn."order", sn.node_id', (sub_id,)
         )]
 
+def get_sub_nodes_for_subs(sub_ids):
+    out = []
+    with _conn() as c:
+        for chunk in _chunked(sub_ids):
+            out.extend(dict(r) for r in c.execute(
+                "SELECT sn.sub_id, sn.node_id, sn.client_uuid, sn.email, sn.client_disabled, "
+                "sn.traffic_offset, sn.traffic_baseline, "
+                "ni.inbound_id, ni.name AS inbound_name, ni.traffic_multiplier, ni.node_id AS xui_node_id, "
+                "n.name, n.address, n.username, n.password, n.proxy_url, n.enabled "
+                "FROM subscription_nodes sn "
+                "JOIN node_inbounds ni ON sn.node_id=ni.id "
+                "JOIN nodes n ON ni.node_id=n.id "
+                f"WHERE sn.sub_id IN ({','.join('?' * len(chunk))})", chunk
+            ))
+    return out
+
+def get_change_bounds():
+    with _conn() as c:
+        r = c.execute("SELECT COALESCE(MIN(seq), 0), COALESCE(MAX(seq), 0) FROM change_log").fetchone()
+        floor, seq = r[0], r[1]
+        if not seq:
+            seq = c.execute("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name='change_log'").fetchone()[0]
+        return floor, seq
+
+def get_sub_version(sub_id):
+    with _conn() as c:
+        return c.execute("SELECT (SELECT COALESCE(MAX(seq), 0) FROM change_log WHERE sub_id=?) || '.' || "
+            "(SELECT COALESCE(MAX(value), 0) FROM generations WHERE name='nodes')", (sub_id,)).fetchone()[0]
+
+def get_sub_config_version(sub_id):
+    with _conn() as c:
+        gen = c.execute("SELECT COALESCE(MAX(value), 0) FROM generations WHERE name='nodes'").fetchone()[0]
+        rows = c.execute('SELECT node_id, client_uuid, email, "order" FROM subscription_nodes WHERE sub_id=? ORDER BY "order", node_id', (sub_id,)).fetchall()
+    return f"{gen}.{hashlib.sha1(repr([tuple(r) for r in rows]).encode()).hexdigest()[:16]}"
+
+def get_changes_since(seq, limit=5000):
+    with _conn() as c:
+        return [tuple(r) for r in c.execute(
+            "SELECT sub_id, MAX(seq) AS last FROM (SELECT sub_id, seq FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?) "
+            "GROUP BY sub_id ORDER BY last", (seq, limit)
+        )]
+
+def prune_change_log(keep=100000):
+    with _conn() as c:
+        c.execute("DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?", (keep,))
+
+def get_sub_node_names(sub_ids=None):
+    sql = ("SELECT sn.sub_id, COALESCE(NULLIF(ni.name, ''), n.name) AS label FROM subscription_nodes sn "
+        "JOIN node_inbounds ni ON sn.node_id=ni.id JOIN nodes n ON ni.node_id=n.id ")
+    order = 'ORDER BY sn.sub_id, sn."order", sn.node_id'
+    names = {}
+    with _conn() as c:
+        if sub_ids is None:
+            rows = c.execute(sql + order).fetchall()
+        else:
+            rows = []
+            for chunk in _chunked(sub_ids):
+                rows.extend(c.execute(sql + f"WHERE sn.sub_id IN ({','.join('?' * len(chunk))}) " + order, chunk).fetchall())
+    for sub_id, label in rows:
+        names.setdefault(sub_id, []).append(label)
+    return names
+
 def get_all_sub_nodes():
     with _conn() as c:
         return [dict(r) for r in c.execute(
@@ -528,6 +812,11 @@ def update_sub_node_uuid(sub_id, node_id, new_uuid):
     with _conn() as c:
         c.execute("UPDATE subscription_nodes SET client_uuid=? WHERE sub_id=? AND node_id=?", (new_uuid, sub_id, node_id))
 
+def set_sub_nodes_state(rows):
+    with _conn() as c:
+        c.executemany("UPDATE subscription_nodes SET client_uuid=?, client_disabled=? WHERE sub_id=? AND node_id=?",
+            [(u, int(d), sid, nid) for sid, nid, u, d in rows])
+
 def add_sub_preserved_traffic(sub_id, amount):
     with _conn() as c:
         c.execute("UPDATE subscriptions SET traffic_preserved=COALESCE(traffic_preserved,0)+? WHERE id=?", (float(amount), sub_id))
@@ -552,9 +841,54 @@ def reorder_node_inbounds(node_id, ni_ids):
         for i, nid in enumerate(ni_ids):
             c.execute('UPDATE node_inbounds SET "order"=? WHERE id=? AND node_id=?', (i, nid, node_id))
 
+def _ua_id(c, ua, fresh):
+    if not ua:
+        return None
+    ua = ua[:512]
+    ua_id = _ua_ids.get(ua) or fresh.get(ua)
+    if ua_id is None:
+        c.execute("INSERT OR IGNORE INTO user_agents (ua) VALUES (?)", (ua,))
+        ua_id = fresh[ua] = c.execute("SELECT id FROM user_agents WHERE ua=?", (ua,)).fetchone()[0]
+    return ua_id
+
+def _remember_uas(fresh):
+    if len(_ua_ids) + len(fresh) > 4096:
+        _ua_ids.clear()
+    _ua_ids.update(fresh)
+
 def log_access(sub_id, ip_address=None, user_agent=None):
-    with _conn() as c:
-        c.execute("INSERT INTO access_logs (sub_id, ip_address, user_agent) VALUES (?,?,?)", (sub_id, ip_address, user_agent))
+    global _flusher
+    with _access_lock:
+        _access_buf.append((sub_id, ip_address, user_agent, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())))
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_access_loop, name="access-log-flush", daemon=True)
+            _flusher.start()
+            atexit.register(_flush_access)
+
+def _flush_access():
+    with _access_lock:
+        rows = _access_buf[:]
+        del _access_buf[:]
+    if not rows:
+        return
+    fresh = {}
+    try:
+        with _conn(read_only=False) as c:
+            c.executemany("INSERT INTO access_logs (sub_id, ip_address, ua_id, accessed_at) "
+                "SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM subscriptions WHERE id=?)",
+                [(sub_id, ip, _ua_id(c, ua, fresh), at, sub_id) for sub_id, ip, ua, at in rows])
+    except sqlite3.OperationalError:
+        with _access_lock:
+            _access_buf[:0] = rows[-10000:]
+        return
+    except sqlite3.Error:
+        return
+    _remember_uas(fresh)
+
+def _flush_access_loop():
+    while True:
+        time.sleep(float(os.getenv("ACCESS_LOG_FLUSH", "2")))
+        _flush_access()
 
 def get_stats(sub_id):
     with _conn() as c:
@@ -563,7 +897,8 @@ def get_stats(sub_id):
             return None
         count = c.execute("SELECT COUNT(*) FROM access_logs WHERE sub_id=?", (sub_id,)).fetchone()[0]
         first = c.execute("SELECT MIN(accessed_at) FROM access_logs WHERE sub_id=?", (sub_id,)).fetchone()[0]
-        last_row = c.execute("SELECT accessed_at, user_agent FROM access_logs WHERE sub_id=? ORDER BY accessed_at DESC LIMIT 1", (sub_id,)).fetchone()
+        last_row = c.execute("SELECT al.accessed_at, COALESCE(ua.ua, al.user_agent) FROM access_logs al LEFT JOIN user_agents ua ON ua.id=al.ua_id "
+            "WHERE al.sub_id=? ORDER BY al.accessed_at DESC, al.id DESC LIMIT 1", (sub_id,)).fetchone()
         last = last_row[0] if last_row else None
         last_ua = last_row[1] if last_row else None
         nodes = c.execute(
@@ -591,3 +926,55 @@ def get_subs_pending_first_use_expiry():
             "SELECT * FROM subscriptions WHERE expire_after_first_use_seconds > 0 AND expire_at IS NULL"
         ).fetchall()
         return [dict(r) for r in rows]
+
+def create_job(kind, params, items):
+    job_id = generate(size=12)
+    items = list(dict.fromkeys(items))
+    with _conn() as c:
+        c.execute("INSERT INTO jobs (id, kind, params, total) VALUES (?,?,?,?)", (job_id, kind, json.dumps(params), len(items)))
+        c.executemany("INSERT INTO job_items (job_id, item) VALUES (?,?)", [(job_id, i) for i in items])
+    return job_id
+
+def _job_row(c, r):
+    job = dict(r)
+    job["params"] = json.loads(job.get("params") or "{}")
+    job["result"] = json.loads(job["result"]) if job.get("result") else None
+    job["errors"] = [dict(e) for e in c.execute("SELECT item, error FROM job_items WHERE job_id=? AND status='error' ORDER BY rowid LIMIT 100", (job["id"],)).fetchall()]
+    return job
+
+def get_job(job_id):
+    with _conn() as c:
+        r = c.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return _job_row(c, r) if r else None
+
+def get_jobs(limit=20):
+    with _conn() as c:
+        return [_job_row(c, r) for r in c.execute("SELECT * FROM jobs ORDER BY created_at DESC, rowid DESC LIMIT ?", (limit,)).fetchall()]
+
+def get_job_pending_items(job_id):
+    with _conn() as c:
+        return [r[0] for r in c.execute("SELECT item FROM job_items WHERE job_id=? AND status='pending' ORDER BY rowid", (job_id,)).fetchall()]
+
+def get_unfinished_jobs():
+    with _conn() as c:
+        return [r[0] for r in c.execute("SELECT id FROM jobs WHERE status IN ('queued','running') ORDER BY created_at, rowid").fetchall()]
+
+def set_job_items(job_id, results):
+    ok = [(job_id, item) for item, err in results if not err]
+    errors = [(err, job_id, item) for item, err in results if err]
+    with _conn() as c:
+        done = c.executemany("UPDATE job_items SET status='ok', error=NULL WHERE job_id=? AND item=? AND status='pending'", ok).rowcount if ok else 0
+        failed = c.executemany("UPDATE job_items SET status='error', error=? WHERE job_id=? AND item=? AND status='pending'", errors).rowcount if errors else 0
+        c.execute("UPDATE jobs SET done=done+?, failed=failed+?, updated_at=CURRENT_TIMESTAMP WHERE id=?", (done + failed, failed, job_id))
+        r = c.execute("SELECT done, failed, total FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return dict(r) if r else None
+
+def set_job_status(job_id, status, result=None):
+    with _conn() as c:
+        c.execute("UPDATE jobs SET status=?, result=COALESCE(?, result), updated_at=CURRENT_TIMESTAMP WHERE id=?",
+            (status, json.dumps(result) if result is not None else None, job_id))
+
+def prune_jobs(days=7):
+    with _conn() as c:
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+        c.execute("DELETE FROM jobs WHERE status IN ('done','failed') AND updated_at < ?", (cutoff,))
@@ -0,0 +1,160 @@
+import json
+import asyncio
+import time
+import queue
+import logging
+import threading
+import metrics
+
+logger = logging.getLogger("feed")
+
+_subscribers = metrics.gauge("ghostgate_feed_subscribers", "Open SSE subscribers per change feed", ("topic",))
+_dropped = metrics.counter("ghostgate_feed_dropped_total", "SSE subscribers dropped for falling behind", ("topic",))
+_produce_seconds = metrics.histogram("ghostgate_feed_produce_seconds", "Time spent computing one change-feed tick", ("topic",))
+
+_BACKLOG = 1000
+
+class _Subscriber:
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.q = asyncio.Queue() if loop else queue.Queue(maxsize=_BACKLOG)
+
+    def put(self, ev):
+        if self.loop is None:
+            try:
+                self.q.put_nowait(ev)
+                return True
+            except queue.Full:
+                return False
+        if self.q.qsize() >= _BACKLOG:
+            return False
+        try:
+            self.loop.call_soon_threadsafe(self.q.put_nowait, ev)
+            return True
+        except RuntimeError:
+            return False
+
+    def close(self):
+        if self.loop is None:
+            try:
+                self.q.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.q.put_nowait(None)
+            except queue.Full:
+                pass
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.q.put_nowait, None)
+        except RuntimeError:
+            pass
+
+class Topic:
+    def __init__(self, name, produce, interval, replay=False, backfill=None):
+        self.name = name
+        self.produce = produce
+        self.interval = interval
+        self.replay = replay
+        self.backfill = backfill
+        self._subs = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last = None
+
+    def subscribe(self, loop=None):
+        sub = _Subscriber(loop)
+        with self._lock:
+            self._subs.add(sub)
+            if self.replay and self._last is not None:
+                sub.put(self._last)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=f"feed-{self.name}", daemon=True)
+                self._thread.start()
+        _subscribers.set(len(self._subs), topic=self.name)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subs.discard(sub)
+        _subscribers.set(len(self._subs), topic=self.name)
+
+    def publish(self, events):
+        with self._lock:
+            if events:
+                self._last = events[-1]
+            subs = list(self._subs)
+        for sub in subs:
+            for ev in events:
+                if not sub.put(ev):
+                    self.unsubscribe(sub)
+                    _dropped.inc(topic=self.name)
+                    sub.close()
+                    break
+
+    def _loop(self):
+        state = None
+        while True:
+            with self._lock:
+                if not self._subs:
+                    self._thread = None
+                    self._last = None
+                    return
+            t0 = time.perf_counter()
+            try:
+                state, events = self.produce(state)
+            except Exception as e:
+                logger.error(f"feed {self.name} failed: {e}")
+                events = []
+            _produce_seconds.observe(time.perf_counter() - t0, topic=self.name)
+            self.publish(events)
+            time.sleep(self.interval)
+
+    def stream(self, heartbeat=15, last_id=None):
+        sub = self.subscribe()
+        sent = None
+        try:
+            if self.backfill is not None:
+                for ev in self.backfill(last_id):
+                    sent = ev.get("seq", sent)
+                    yield _format(ev)
+            while True:
+                try:
+                    ev = sub.q.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                if ev is None:
+                    return
+                if sent is not None and ev.get("seq") is not None and ev["seq"] <= sent:
+                    continue
+                yield _format(ev)
+        finally:
+            self.unsubscribe(sub)
+
+    async def astream(self, heartbeat=15, last_id=None):
+        sub = self.subscribe(asyncio.get_running_loop())
+        sent = None
+        try:
+            if self.backfill is not None:
+                for ev in await asyncio.to_thread(self.backfill, last_id):
+                    sent = ev.get("seq", sent)
+                    yield _format(ev)
+            while True:
+                try:
+                    ev = await asyncio.wait_for(sub.q.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if ev is None:
+                    return
+                if sent is not None and ev.get("seq") is not None and ev["seq"] <= sent:
+                    continue
+                yield _format(ev)
+        finally:
+            self.unsubscribe(sub)
+
+def _format(ev):
+    if ev.get("seq") is not None:
+        return f"id: {ev['seq']}\ndata: {json.dumps(ev)}\n\n"
+    return f"data: {json.dumps(ev)}\n\n"
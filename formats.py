@@ -0,0 +1,166 @@
+import json
+import base64
+from urllib.parse import urlsplit, parse_qs, unquote
+
+FORMATS = ("html", "text", "base64", "clash", "sing-box")
+
+def _vless(cfg):
+    u = urlsplit(cfg)
+    q = {k: v[0] for k, v in parse_qs(u.query).items()}
+    return {
+        "name": unquote(u.fragment), "type": "vless", "server": u.hostname, "port": u.port or 443,
+        "uuid": unquote(u.username or ""), "network": q.get("type", "tcp"), "security": q.get("security", "none"),
+        "flow": q.get("flow", ""), "sni": q.get("sni", ""), "fp": q.get("fp", ""),
+        "alpn": [a for a in q.get("alpn", "").split(",") if a], "insecure": q.get("allowInsecure") == "1",
+        "pbk": q.get("pbk", ""), "sid": q.get("sid", ""), "path": q.get("path", q.get("serviceName", "")),
+        "host": q.get("host", ""), "header": q.get("headerType", "none"),
+    }
+
+def _vmess(cfg):
+    o = json.loads(base64.b64decode(cfg[len("vmess://"):]))
+    return {
+        "name": o.get("ps", ""), "type": "vmess", "server": o.get("add"), "port": int(o.get("port") or 443),
+        "uuid": o.get("id", ""), "network": o.get("net", "tcp"), "security": "tls" if o.get("tls") == "tls" else "none",
+        "flow": "", "sni": o.get("sni", ""), "fp": o.get("fp", ""), "alpn": [a for a in (o.get("alpn") or "").split(",") if a],
+        "insecure": False, "pbk": "", "sid": "", "path": o.get("path", ""), "host": o.get("host", ""), "header": o.get("type", "none"),
+    }
+
+def _vmess_outbound(cfg):
+    o = json.loads(cfg)
+    ob = o["outbounds"][0]
+    vnext = ob["settings"]["vnext"][0]
+    st = ob.get("streamSettings", {})
+    tls = st.get("tlsSettings", {})
+    net = st.get("network", "tcp")
+    ws = st.get("wsSettings", {})
+    grpc = st.get("grpcSettings", {})
+    hu = st.get("httpupgradeSettings", {})
+    return {
+        "name": o.get("remarks", ""), "type": "vmess", "server": vnext["address"], "port": vnext["port"],
+        "uuid": vnext["users"][0]["id"], "network": net, "security": st.get("security", "none"),
+        "flow": "", "sni": tls.get("serverName", ""), "fp": tls.get("fingerprint", ""), "alpn": tls.get("alpn", []),
+        "insecure": bool(tls.get("allowInsecure")), "pbk": "", "sid": "",
+        "path": ws.get("path") or grpc.get("serviceName") or hu.get("path", ""),
+        "host": (ws.get("headers") or {}).get("Host") or hu.get("host", ""),
+        "header": st.get("tcpSettings", {}).get("header", {}).get("type", "none") if net == "tcp" else "none",
+    }
+
+def parse(cfg):
+    try:
+        if cfg.startswith("vless://"):
+            return _vless(cfg)
+        if cfg.startswith("vmess://"):
+            return _vmess(cfg)
+        if cfg.startswith("{"):
+            return _vmess_outbound(cfg)
+    except Exception:
+        pass
+    return None
+
+def model(configs):
+    proxies, seen = [], set()
+    for entry in configs:
+        p = parse(entry["config"])
+        if p is None:
+            continue
+        base = p["name"] or p["server"]
+        name, n = base, 2
+        while name in seen:
+            name, n = f"{base} ({n})", n + 1
+        seen.add(name)
+        p["name"] = name
+        proxies.append(p)
+    return proxies
+
+def supported(p):
+    return p["network"] in ("tcp", "ws", "grpc", "httpupgrade") and not (p["network"] == "tcp" and p["header"] not in ("none", ""))
+
+def _clash_proxy(p):
+    if not supported(p):
+        return None
+    out = {"name": p["name"], "type": p["type"], "server": p["server"], "port": p["port"], "uuid": p["uuid"], "udp": True}
+    if p["type"] == "vmess":
+        out.update({"alterId": 0, "cipher": "auto"})
+    out["network"] = "ws" if p["network"] == "httpupgrade" else p["network"]
+    if p["security"] in ("tls", "reality"):
+        out["tls"] = True
+        if p["sni"]:
+            out["servername"] = p["sni"]
+        if p["fp"]:
+            out["client-fingerprint"] = p["fp"]
+        if p["alpn"]:
+            out["alpn"] = p["alpn"]
+        if p["insecure"]:
+            out["skip-cert-verify"] = True
+        if p["security"] == "reality":
+            out["reality-opts"] = {"public-key": p["pbk"], "short-id": p["sid"]}
+    if p["flow"]:
+        out["flow"] = p["flow"]
+    if p["network"] in ("ws", "httpupgrade"):
+        ws = {"path": p["path"] or "/"}
+        if p["host"]:
+            ws["headers"] = {"Host": p["host"]}
+        if p["network"] == "httpupgrade":
+            ws["v2ray-http-upgrade"] = True
+        out["ws-opts"] = ws
+    elif p["network"] == "grpc":
+        out["grpc-opts"] = {"grpc-service-name": p["path"]}
+    return out
+
+def _flow(v):
+    return json.dumps(v, ensure_ascii=False)
+
+def clash(proxies, group="Proxy"):
+    items = [c for c in (_clash_proxy(p) for p in proxies) if c]
+    lines = ["mixed-port: 7890", "mode: rule", "proxies:"]
+    lines += [f"  - {_flow(c)}" for c in items] or ["  []"]
+    lines += ["proxy-groups:", f"  - {_flow({'name': group, 'type': 'select', 'proxies': [c['name'] for c in items] or ['DIRECT']})}"]
+    lines += ["rules:", f"  - {_flow('MATCH,' + group)}"]
+    return "\n".join(lines) + "\n"
+
+def _singbox_outbound(p):
+    if not supported(p):
+        return None
+    out = {"type": p["type"], "tag": p["name"], "server": p["server"], "server_port": p["port"], "uuid": p["uuid"]}
+    if p["type"] == "vmess":
+        out.update({"security": "auto", "alter_id": 0})
+    if p["flow"]:
+        out["flow"] = p["flow"]
+    if p["security"] in ("tls", "reality"):
+        tls = {"enabled": True}
+        if p["sni"]:
+            tls["server_name"] = p["sni"]
+        if p["insecure"]:
+            tls["insecure"] = True
+        if p["alpn"]:
+            tls["alpn"] = p["alpn"]
+        if p["fp"]:
+            tls["utls"] = {"enabled": True, "fingerprint": p["fp"]}
+        if p["security"] == "reality":
+            tls["reality"] = {"enabled": True, "public_key": p["pbk"], "short_id": p["sid"]}
+        out["tls"] = tls
+    if p["network"] in ("ws", "httpupgrade"):
+        tr = {"type": p["network"], "path": p["path"] or "/"}
+        if p["host"]:
+            if p["network"] == "ws":
+                tr["headers"] = {"Host": p["host"]}
+            else:
+                tr["host"] = p["host"]
+        out["transport"] = tr
+    elif p["network"] == "grpc":
+        out["transport"] = {"type": "grpc", "service_name": p["path"]}
+    return out
+
+def singbox(proxies, group="proxy"):
+    outbounds = [o for o in (_singbox_outbound(p) for p in proxies) if o]
+    tags = [o["tag"] for o in outbounds]
+    return json.dumps({
+        "log": {"level": "warn"},
+        "inbounds": [{"type": "tun", "tag": "tun-in", "address": ["172.19.0.1/30"], "auto_route": True, "strict_route": True},
+            {"type": "mixed", "tag": "mixed-in", "listen": "127.0.0.1", "listen_port": 2080}],
+        "outbounds": [{"type": "selector", "tag": group, "outbounds": tags or ["direct"]}, *outbounds, {"type": "direct", "tag": "direct"}],
+        "route": {"auto_detect_interface": True, "final": group},
+    }, ensure_ascii=False, indent=2)
+
+def b64(lines):
+    return base64.b64encode("\n".join(lines).encode()).decode()
@@ -0,0 +1,176 @@
+import os
+import json
+import asyncio
+import time
+import queue
+import logging
+import threading
+import database as db
+import metrics
+
+logger = logging.getLogger("jobs")
+
+_jobs = metrics.counter("ghostgate_jobs_total", "Background jobs by kind and final status", ("kind", "status"))
+_items = metrics.counter("ghostgate_job_items_total", "Background job items processed by kind and result", ("kind", "result"))
+_running = metrics.gauge("ghostgate_jobs_running", "Background jobs currently running")
+
+_handlers = {}
+_queue = queue.Queue()
+_cond = threading.Condition()
+_events = {}
+_EVENT_CAP = 1000
+_workers = []
+_workers_lock = threading.Lock()
+
+def handler(kind):
+    def _register(fn):
+        _handlers[kind] = fn
+        return fn
+    return _register
+
+class Job:
+    def __init__(self, job_id, kind, params):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+
+    def report(self, results):
+        results = list(results)
+        if not results:
+            return
+        counts = db.set_job_items(self.id, results)
+        for item, err in results:
+            _items.inc(kind=self.kind, result="error" if err else "ok")
+            _publish(self.id, {"type": "item", "item": item, "error": err, "status": "running", **counts})
+
+    def report_one(self, item, error=None):
+        self.report([(item, error)])
+
+def _publish(job_id, event):
+    with _cond:
+        entry = _events.setdefault(job_id, [0, []])
+        entry[1].append(event)
+        if len(entry[1]) > _EVENT_CAP:
+            drop = len(entry[1]) - _EVENT_CAP
+            del entry[1][:drop]
+            entry[0] += drop
+        _cond.notify_all()
+
+def _since(job_id, idx):
+    entry = _events.get(job_id)
+    if entry is None:
+        return idx, []
+    offset, evs = entry
+    return offset + len(evs), evs[max(idx - offset, 0):]
+
+def _prune_events():
+    finished = [jid for jid, (_, evs) in _events.items() if evs and evs[-1].get("type") == "status" and evs[-1].get("status") in ("done", "failed")]
+    for jid in finished[:-20]:
+        _events.pop(jid, None)
+
+def _run(job_id):
+    job = db.get_job(job_id)
+    if not job or job["status"] not in ("queued", "running"):
+        return
+    fn = _handlers.get(job["kind"])
+    if fn is None:
+        db.set_job_status(job_id, "failed", {"error": f"unknown job kind {job['kind']}"})
+        return
+    db.set_job_status(job_id, "running")
+    _publish(job_id, {"type": "status", "status": "running", "done": job["done"], "failed": job["failed"], "total": job["total"]})
+    _running.inc()
+    status, result = "done", None
+    try:
+        result = fn(Job(job_id, job["kind"], job["params"]), db.get_job_pending_items(job_id))
+    except Exception as e:
+        logger.error(f"job {job_id} ({job['kind']}) failed: {e}", exc_info=True)
+        status, result = "failed", {"error": str(e)}
+    finally:
+        _running.dec()
+    db.set_job_status(job_id, status, result)
+    _jobs.inc(kind=job["kind"], status=status)
+    final = db.get_job(job_id)
+    with _cond:
+        _prune_events()
+    _publish(job_id, {"type": "status", **{k: final.get(k) for k in ("status", "done", "failed", "total", "errors", "result")}})
+
+def _worker():
+    while True:
+        job_id = _queue.get()
+        try:
+            _run(job_id)
+        except Exception as e:
+            logger.error(f"job worker error: {e}", exc_info=True)
+
+def _ensure_workers():
+    with _workers_lock:
+        if _workers:
+            return
+        for i in range(max(1, int(os.getenv("JOB_WORKERS", "2")))):
+            t = threading.Thread(target=_worker, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
+
+def submit(kind, params, items):
+    job_id = db.create_job(kind, params, items)
+    _ensure_workers()
+    _queue.put(job_id)
+    return job_id
+
+def start():
+    _ensure_workers()
+    try:
+        db.prune_jobs()
+    except Exception:
+        pass
+    for job_id in db.get_unfinished_jobs():
+        logger.info(f"Resuming job {job_id}")
+        _queue.put(job_id)
+
+def stream(job_id):
+    with _cond:
+        idx = _since(job_id, 0)[0]
+    job = db.get_job(job_id)
+    if not job:
+        return
+    yield f"data: {json.dumps({'type': 'snapshot', **job})}\n\n"
+    if job["status"] in ("done", "failed"):
+        return
+    last_send = time.time()
+    while True:
+        with _cond:
+            if _since(job_id, idx)[0] <= idx:
+                _cond.wait(5)
+            idx, evs = _since(job_id, idx)
+        for ev in evs:
+            yield f"data: {json.dumps(ev)}\n\n"
+            last_send = time.time()
+            if ev.get("type") == "status" and ev.get("status") in ("done", "failed"):
+                return
+        if not evs and time.time() - last_send >= 15:
+            yield ": heartbeat\n\n"
+            last_send = time.time()
+
+async def astream(job_id):
+    with _cond:
+        idx = _since(job_id, 0)[0]
+    job = await asyncio.to_thread(db.get_job, job_id)
+    if not job:
+        return
+    yield f"data: {json.dumps({'type': 'snapshot', **job})}\n\n"
+    if job["status"] in ("done", "failed"):
+        return
+    last_send = time.time()
+    while True:
+        with _cond:
+            idx, evs = _since(job_id, idx)
+        for ev in evs:
+            yield f"data: {json.dumps(ev)}\n\n"
+            last_send = time.time()
+            if ev.get("type") == "status" and ev.get("status") in ("done", "failed"):
+                return
+        if not evs:
+            if time.time() - last_send >= 15:
+                yield ": heartbeat\n\n"
+                last_send = time.time()
+            await asyncio.sleep(0.5)
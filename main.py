@@ -1,6 +1,10 @@
 import os
 import sys
 import argparse
+import atexit
+import socket
+import subprocess
+import time
 import threading
 import logging
 from dotenv import load_dotenv
@@ -60,7 +64,53 @@ def _migrate(old_db_path, node_id):
     conn.close()
     print(f"Migrated {count}/{len(configs)} subscriptions from {old_db_path}")
 
-_CLI_COMMANDS = {"list", "stats", "nodes", "subnodes", "listsubnode", "addsubnode", "editsubnode", "delsubnode", "status", "create", "delete", "edit", "update", "help", "configs", "addnode", "delnode", "editnode", "bot", "regen", "regen-uuid", "reset-traffic"}
+_CLI_COMMANDS = {"list", "stats", "nodes", "subnodes", "listsubnode", "addsubnode", "editsubnode", "delsubnode", "status", "create", "delete", "edit", "update", "help", "configs", "addnode", "delnode", "editnode", "bot", "regen", "regen-uuid", "reset-traffic", "loadtest"}
+
+def _serve_sub_only(fd=None):
+    import database as db
+    db.set_read_only(True)
+    import panel
+    from waitress import serve
+    threads = int(os.getenv("SUB_THREADS", "8"))
+    if fd is not None:
+        parent = os.getppid()
+        def _watch_parent():
+            while os.getppid() == parent:
+                time.sleep(2)
+            os._exit(0)
+        threading.Thread(target=_watch_parent, daemon=True).start()
+        serve(panel.sub_app, sockets=[socket.socket(fileno=fd)], threads=threads, _quiet=True)
+        return
+    host = os.getenv("SUB_HOST") or os.getenv("HOST", "127.0.0.1")
+    port = int(os.getenv("SUB_PORT") or os.getenv("PORT", "5000"))
+    logger.info(f"GhostGate v{updater.VERSION} serving subscriptions only at http://{host}:{port}/sub/")
+    serve(panel.sub_app, host=host, port=port, threads=threads)
+
+def _start_sub_workers(host, port, count):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+    fd = sock.fileno()
+    cmd = [sys.executable] if getattr(sys, "frozen", False) else [sys.executable, os.path.abspath(__file__)]
+    cmd += ["--sub-only", "--sub-fd", str(fd)]
+    procs = [None] * count
+    def _stop():
+        for p in procs:
+            if p is not None and p.poll() is None:
+                p.terminate()
+    atexit.register(_stop)
+    def _supervise():
+        while True:
+            for i, p in enumerate(procs):
+                if p is None or p.poll() is not None:
+                    if p is not None:
+                        logger.warning(f"Subscription worker {i} exited with {p.returncode}, restarting")
+                    procs[i] = subprocess.Popen(cmd, pass_fds=(fd,))
+            time.sleep(1)
+    threading.Thread(target=_supervise, name="sub-workers", daemon=True).start()
+    logger.info(f"Subscriptions served by {count} worker processes at http://{host}:{port}/sub/")
 
 def main():
     cli_args = [a for a in sys.argv[1:] if not a.startswith("--")]
@@ -72,6 +122,8 @@ def main():
     parser = argparse.ArgumentParser(description="GhostGate - VPN Subscription Manager")
     parser.add_argument("--generate-path", action="store_true", help="Generate a new random panel path")
     parser.add_argument("--version", action="store_true", help="Show version and exit")
+    parser.add_argument("--sub-only", action="store_true", help="Serve only /sub/<id> with read-only database access")
+    parser.add_argument("--sub-fd", type=int, default=None, help=argparse.SUPPRESS)
     parser.add_argument("--migrate-from", help=argparse.SUPPRESS)
     parser.add_argument("--migrate-node", type=int, default=1, help=argparse.SUPPRESS)
     args = parser.parse_args()
@@ -85,6 +137,10 @@ def main():
         print(generate(size=20))
         sys.exit(0)
 
+    if args.sub_only:
+        _serve_sub_only(args.sub_fd)
+        sys.exit(0)
+
     import database as db
     db.init_db()
 
@@ -108,6 +164,9 @@ def main():
     import panel
     panel.register_routes(panel_path)
 
+    import jobs
+    jobs.start()
+
     sync_interval = int(os.getenv("SYNC_INTERVAL", "20"))
     import sync
     sync.start_sync(sync_interval)
@@ -121,13 +180,28 @@ def main():
 
     from waitress import serve
 
+    if os.getenv("SSE_PORT"):
+        import sse
+        sse.start(host, int(os.getenv("SSE_PORT")), panel_path)
+
     def _run_flask():
         logger.info(f"Panel running at http://{host}:{port}/{panel_path}/")
-        serve(panel.app, host=host, port=port, threads=int(os.getenv("PANEL_THREADS", "8")))
+        serve(panel.app, host=host, port=port, threads=int(os.getenv("PANEL_THREADS", "8")) + panel.SSE_MAX_STREAMS)
 
     flask_thread = threading.Thread(target=_run_flask, daemon=True)
     flask_thread.start()
 
+    sub_workers = int(os.getenv("SUB_WORKERS", "0"))
+    if os.getenv("SUB_PORT") and sub_workers > 0:
+        _start_sub_workers(os.getenv("SUB_HOST") or host, int(os.getenv("SUB_PORT")), sub_workers)
+    elif os.getenv("SUB_PORT"):
+        sub_host = os.getenv("SUB_HOST") or host
+        sub_port = int(os.getenv("SUB_PORT"))
+        def _run_sub():
+            logger.info(f"Subscriptions served at http://{sub_host}:{sub_port}/sub/")
+            serve(panel.sub_app, host=sub_host, port=sub_port, threads=int(os.getenv("SUB_THREADS", "8")))
+        threading.Thread(target=_run_sub, daemon=True).start()
+
     if os.getenv("BOT_ENABLED", "true").lower() != "false":
         logger.info("Starting Telegram bot...")
         import bot
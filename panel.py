@@ -3,27 +3,87 @@ import sys
 import json
 import uuid
 import base64
-import io
+import math
 import time
+import asyncio
 import threading
 import subprocess
 from urllib.parse import quote
 from datetime import datetime, timezone, timedelta
-from flask import Flask, jsonify, request, Response, render_template_string, abort, send_from_directory
+from flask import Flask, Blueprint, jsonify, request, Response, abort
+from werkzeug.middleware.proxy_fix import ProxyFix
 from nanoid import generate
 import psutil
-import qrcode
 from dotenv import dotenv_values, set_key
+import assets
+import cache
+import compress
 import database as db
+import feed
+import formats
+import jobs
+import metrics
+import qr
+import ratelimit
+import tracing
 import updater
-from xui_client import XUIClient
+import useragent
+from xui_client import XUIClient, AsyncXUIClient, add_clients_by_node, breaker_state, reset_breaker, run_async
 
 app = Flask(__name__)
-BASE_URL = ""
-
-@app.route("/external/<path:filename>")
+sub_app = Flask(__name__)
+public_bp = Blueprint("public", __name__)
+sub_bp = Blueprint("sub", __name__)
+BASE_URL = os.getenv("BASE_URL", "")
+
+def _trace_begin():
+    tracing.begin_request()
+
+def _trace_end(response):
+    tracing.end_request(request.method, request.url_rule.rule if request.url_rule else "<unmatched>", response.status_code)
+    return response
+
+def _trace_abort(exc):
+    if exc is not None:
+        tracing.end_request(request.method, request.url_rule.rule if request.url_rule else "<unmatched>", 500)
+
+for _a in (app, sub_app):
+    if int(os.getenv("TRUSTED_PROXIES", "0")) > 0:
+        _a.wsgi_app = ProxyFix(_a.wsgi_app, x_for=int(os.getenv("TRUSTED_PROXIES", "0")))
+    _a.before_request(_trace_begin)
+    _a.after_request(_trace_end)
+    _a.after_request(compress.after_request)
+    _a.teardown_request(_trace_abort)
+
+@public_bp.route("/external/<path:filename>")
 def external_static(filename):
-    return send_from_directory(os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend", "external"), filename)
+    return assets.serve(filename) or abort(404)
+
+_FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
+_TEMPLATE_RELOAD = os.getenv("TEMPLATE_RELOAD", "false").lower() == "true"
+_frontend_cache = {}
+
+def _frontend(name, transform=None):
+    path = os.path.join(_FRONTEND_DIR, name)
+    entry = _frontend_cache.get((name, transform))
+    if entry is not None and not _TEMPLATE_RELOAD:
+        return entry[1]
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    if entry is None or entry[0] != mtime:
+        try:
+            with open(path) as f:
+                src = f.read()
+        except OSError:
+            src = ""
+        entry = (mtime, transform(src) if transform else src)
+        _frontend_cache[(name, transform)] = entry
+    return entry[1]
+
+def _compile(src):
+    return app.jinja_env.from_string(assets.rewrite(src))
 
 def _tmult(ni):
     v = ni.get("traffic_multiplier")
@@ -203,13 +263,33 @@ def _fmt_vmess(client_uuid, label, server, port, stream_settings, security):
         obj["host"] = s.get("host", "") or next((v for k, v in (s.get("headers") or {}).items() if k.lower() == "host"), "")
     return "vmess://" + base64.b64encode(json.dumps(obj, separators=(",", ":")).encode()).decode()
 
+async def _fetch_inbounds(snodes):
+    groups = {}
+    for sn in snodes:
+        groups.setdefault((sn["address"], sn["username"]), {}).setdefault(sn["inbound_id"], sn)
+    inbounds = {}
+    async def _get(xui, key, inbound_id):
+        try:
+            inbounds[(key, inbound_id)] = await xui.get_inbound(inbound_id)
+        except Exception:
+            pass
+    async def _node(key, by_inbound):
+        sn = next(iter(by_inbound.values()))
+        try:
+            async with AsyncXUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url")) as xui:
+                await asyncio.gather(*[_get(xui, key, inbound_id) for inbound_id in by_inbound])
+        except Exception:
+            pass
+    await asyncio.gather(*[_node(key, by_inbound) for key, by_inbound in groups.items()])
+    return inbounds
+
 def _build_sub_configs(sub_id):
     snodes = db.get_sub_nodes(sub_id)
+    inbounds = run_async(_fetch_inbounds(snodes)) if snodes else {}
     result = []
     for sn in snodes:
         try:
-            xui = XUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url"))
-            inbound = xui.get_inbound(sn["inbound_id"])
+            inbound = inbounds.get(((sn["address"], sn["username"]), sn["inbound_id"]))
             if not inbound:
                 continue
             stream = json.loads(inbound.get("streamSettings", "{}"))
@@ -218,9 +298,10 @@ def _build_sub_configs(sub_id):
             orig_port = inbound.get("port", 443)
             raw_addr = sn["address"].split("//")[-1].split("/")[0]
             orig_server = raw_addr.split(":")[0]
-            client = xui.get_client_by_email(sn["inbound_id"], sn["email"])
+            settings = json.loads(inbound.get("settings", "{}"))
+            client = next((c for c in settings.get("clients", []) if c.get("email") == sn["email"]), None)
             flow = (client.get("flow") or "") if client else ""
-            encryption = json.loads(inbound.get("settings", "{}")).get("decryption", "none")
+            encryption = settings.get("decryption", "none")
             _fmt = _fmt_vmess if proto == "vmess" else _fmt_vless
             ext_proxies = stream.get("externalProxy") or []
             if ext_proxies:
@@ -243,23 +324,37 @@ def _build_sub_configs(sub_id):
     return result
 
 def _make_qr_b64(text):
-    qr = qrcode.QRCode(box_size=6, border=2)
-    qr.add_data(text)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="#00e5a0", back_color="#1a1d2e")
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    return base64.b64encode(buf.getvalue()).decode()
-
-@app.route("/sub/<sub_id>")
+    return qr.b64(text)
+
+@sub_bp.route("/sub/<sub_id>")
 def sub_page(sub_id):
+    ip = request.headers.get("X-Forwarded-For", request.remote_addr or "").split(",")[0].strip()
+    wait = _sub_throttle(sub_id)
+    if wait:
+        return "", 429, {"Retry-After": str(math.ceil(wait))}
     sub = db.get_sub(sub_id)
     if not sub:
         return abort(404)
-    ip = request.headers.get("X-Forwarded-For", request.remote_addr or "").split(",")[0].strip()
     ua = request.headers.get("User-Agent", "")
     db.log_access(sub_id, ip, ua)
     base_url = BASE_URL or request.host_url.rstrip("/")
+    fmt = request.args.get("format", "")
+    if fmt not in formats.FORMATS:
+        fmt = useragent.classify(ua)[1]
+        if fmt in ("clash", "sing-box") and (os.getenv("SUB_AUTO_FORMAT", "false").lower() != "true" or not _lossless(sub_id)):
+            fmt = "text"
+    if not BASE_URL:
+        return _render_sub(sub, base_url, fmt)
+    key = f"{sub_id}|{fmt}|{db.get_sub_version(sub_id)}"
+    cached = _sub_cache.get(key)
+    if cached is None:
+        cached = _sub_flight.do(key, lambda: _cache_set(key, _render_sub(sub, base_url, fmt)))
+    compress.cache_as(key)
+    body, status, headers = cached
+    return body, status, headers
+
+def _render_sub(sub, base_url, fmt):
+    sub_id = sub["id"]
     sub_url = f"{base_url}/sub/{sub_id}"
     sm = max(1, int(sub.get("show_multiplier") or 1))
     total_bytes = sub.get("used_bytes") or 0
@@ -285,44 +380,112 @@ def sub_page(sub_id):
         expire_str = "No Expiry"
     data_label = os.getenv("DATA_LABEL") or "⬇️ Data left"
     expire_label = os.getenv("EXPIRE_LABEL") or "⏰ Expires"
-    is_browser = any(b in ua for b in ["Mozilla", "Chrome", "Safari", "Firefox", "Edge", "Opera"])
-    if is_browser:
-        qr_b64 = _make_qr_b64(sub_url)
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        with open(os.path.join(base_dir, "frontend", "sub.html")) as f:
-            tmpl = f.read()
+    if fmt == "html":
+        lazy_qr = os.getenv("SUB_QR_MODE", "inline") == "lazy"
+        version = db.get_sub_version(sub_id) if lazy_qr else 0
+        qr_src = f"{sub_url}/qr" if lazy_qr else f"data:image/png;base64,{_make_qr_b64(sub_url)}"
         sub_enabled = bool(sub.get("enabled", 1))
         expire_exact = f"Exact expiry: {sub['expire_at']}" if sub.get("expire_at") else (f"Expiry starts after first use ({int(sub.get('expire_after_first_use_seconds',0))//86400} days)" if int(sub.get("expire_after_first_use_seconds",0))>0 else "No expiry set")
         data_tip = f"Used: {total_bytes:,} bytes ({total_bytes/1073741824:.4f} GB)\nLimit: {limit_bytes:,} bytes ({sub['data_gb']} GB)\n{data_percent}% consumed" if limit_bytes>0 else f"Used: {total_bytes:,} bytes ({total_bytes/1073741824:.4f} GB)\nLimit: Unlimited"
-        raw_configs = _build_sub_configs(sub_id)
-        configs_with_qr = [{"node": c["node"], "config": c["config"], "qr_b64": _make_qr_b64(c["config"])} for c in raw_configs]
-        return render_template_string(tmpl,
-            sub_url=sub_url, qr_b64=qr_b64,
-            data_used_str=data_used_str, data_total_str=data_total_str, data_percent=data_percent,
-            expire_str=expire_str, is_expired=is_expired, is_over_limit=is_over_limit,
-            sub_enabled=sub_enabled,
-            data_label=data_label, expire_label=expire_label,
-            expire_exact=expire_exact, data_tip=data_tip,
-            configs=configs_with_qr
-        )
+        raw_configs = _sub_configs(sub_id)
+        configs_with_qr = [{"node": c["node"], "config": c["config"],
+            "qr_src": f"{sub_url}/qr/{i}?v={version}" if lazy_qr else f"data:image/png;base64,{_make_qr_b64(c['config'])}"}
+            for i, c in enumerate(raw_configs)]
+        with tracing.span("render", "sub.html"):
+            html = _frontend("sub.html", _compile).render(
+                sub_url=sub_url, qr_src=qr_src,
+                data_used_str=data_used_str, data_total_str=data_total_str, data_percent=data_percent,
+                expire_str=expire_str, is_expired=is_expired, is_over_limit=is_over_limit,
+                sub_enabled=sub_enabled,
+                data_label=data_label, expire_label=expire_label,
+                expire_exact=expire_exact, data_tip=data_tip,
+                configs=configs_with_qr
+            )
+        return html, 200, {"Content-Type": "text/html; charset=utf-8"}
     configs = [
         f"vless://00000000-0000-0000-0000-000000000001@0.0.0.0:443?type=tcp#{quote(f'{data_label}: {total_bytes*sm/1073741824:.2f} GB / {data_total_str}')}",
         f"vless://00000000-0000-0000-0000-000000000002@0.0.0.0:443?type=tcp#{quote(f'{expire_label}: {expire_str}')}",
         *([f"vless://00000000-0000-0000-0000-000000000003@0.0.0.0:443?type=tcp#{quote(sub['note'])}"] if sub.get("note") else []),
     ]
-    for entry in _build_sub_configs(sub_id):
-        configs.append(entry["config"])
-    profile_title = os.getenv("PROFILE_TITLE", "GhostGate Subscription")
     headers = {
         "Content-Type": "text/plain; charset=utf-8",
-        "Profile-Title": base64.b64encode(profile_title.encode()).decode(),
+        "Profile-Title": _PROFILE_TITLE_B64,
         "subscription-userinfo": f"upload=0;download={total_bytes*sm};total={limit_bytes*sm if limit_bytes else 0};expire={expire_ts}",
         "profile-update-interval": "1",
         "Content-Disposition": "attachment; filename=ghostgate",
         "profile-web-page-url": sub_url
     }
+    if fmt == "clash":
+        headers.update({"Content-Type": "text/yaml; charset=utf-8", "Content-Disposition": "attachment; filename=ghostgate.yaml"})
+        return formats.clash(_sub_model(sub_id)), 200, headers
+    if fmt == "sing-box":
+        headers.update({"Content-Type": "application/json; charset=utf-8", "Content-Disposition": "attachment; filename=ghostgate.json"})
+        return formats.singbox(_sub_model(sub_id)), 200, headers
+    for entry in _sub_configs(sub_id):
+        configs.append(entry["config"])
+    if fmt == "base64":
+        return formats.b64(configs), 200, headers
     return "\n".join(configs), 200, headers
 
+_PROFILE_TITLE_B64 = base64.b64encode(os.getenv("PROFILE_TITLE", "GhostGate Subscription").encode()).decode()
+_frontend("sub.html", _compile)
+
+_sub_cache = cache.shared("sub", int(os.getenv("SUB_CACHE_TTL", "30")))
+_sub_flight = cache.SingleFlight("sub")
+_sub_limit = ratelimit.TokenBucket("sub", float(os.getenv("SUB_RATE_LIMIT", "1")), int(os.getenv("SUB_RATE_BURST", "10")))
+_sub_ip_limit = ratelimit.TokenBucket("sub_ip", float(os.getenv("SUB_IP_RATE_LIMIT", "0")), int(os.getenv("SUB_IP_RATE_BURST", "30")))
+
+def _sub_throttle(sub_id):
+    return _sub_ip_limit.take(request.remote_addr or "") or _sub_limit.take(sub_id)
+
+def _cache_set(key, value):
+    _sub_cache.set(key, value)
+    return value
+
+def _sub_configs(sub_id):
+    key = f"{sub_id}|configs|{db.get_sub_config_version(sub_id)}"
+    configs = _sub_cache.get(key)
+    if configs is None:
+        configs = _sub_flight.do(key, lambda: _cache_set(key, _build_sub_configs(sub_id)))
+    return configs
+
+def _lossless(sub_id):
+    model = _sub_model(sub_id)
+    return len(model) == len(_sub_configs(sub_id)) and all(formats.supported(p) for p in model)
+
+def _sub_model(sub_id):
+    key = f"{sub_id}|model|{db.get_sub_config_version(sub_id)}"
+    model = _sub_cache.get(key)
+    if model is None:
+        model = _sub_flight.do(key, lambda: _cache_set(key, formats.model(_sub_configs(sub_id))))
+    return model
+
+@sub_bp.route("/sub/<sub_id>/qr")
+@sub_bp.route("/sub/<sub_id>/qr/<int:n>")
+def sub_qr(sub_id, n=None):
+    wait = _sub_throttle(sub_id)
+    if wait:
+        return "", 429, {"Retry-After": str(math.ceil(wait))}
+    if not db.get_sub(sub_id):
+        return abort(404)
+    if n is None:
+        text = f"{BASE_URL or request.host_url.rstrip('/')}/sub/{sub_id}"
+    else:
+        configs = _sub_configs(sub_id)
+        if n >= len(configs):
+            return abort(404)
+        text = configs[n]["config"]
+    return Response(qr.png(text), content_type="image/png", headers={"Cache-Control": "private, max-age=300"})
+
+app.register_blueprint(public_bp)
+sub_app.register_blueprint(public_bp)
+sub_app.register_blueprint(sub_bp)
+
+@sub_app.errorhandler(404)
+@sub_app.errorhandler(500)
+def _sub_err(e):
+    return "", getattr(e, "code", 500)
+
 def _disable_subnode_clients(ni_id):
     ni = db.get_node_inbound_with_node(ni_id)
     if not ni:
@@ -436,24 +599,322 @@ def _enable_node_clients(node_id):
         if ni.get("enabled"):
             _enable_subnode_clients(ni["id"])
 
+def _produce_stats(state):
+    return None, [{**db.get_overview_stats(), "system": _sys_info()}]
+
+def _sub_change_events(changes):
+    ids = [sub_id for sub_id, _ in changes]
+    subs = {sub["id"]: sub for sub in db.get_subs_by_ids(ids)}
+    names = db.get_sub_node_names(ids)
+    events = []
+    for sub_id, seq in changes:
+        sub = subs.get(sub_id)
+        if sub is None:
+            events.append({"type": "delete", "id": sub_id, "seq": seq})
+        else:
+            sub["node_names"] = names.get(sub_id, [])
+            events.append({"type": "update", "sub": sub, "seq": seq})
+    return events
+
+def _produce_subs(seq):
+    if seq is None:
+        return db.get_change_bounds()[1], []
+    changes = db.get_changes_since(seq)
+    if not changes:
+        return seq, []
+    return changes[-1][1], _sub_change_events(changes)
+
+def _backfill_subs(last_id):
+    floor, seq = db.get_change_bounds()
+    if last_id is None or last_id > seq:
+        return [{"type": "hello", "seq": seq}]
+    if floor and last_id < floor - 1:
+        return [{"type": "reset", "seq": seq}]
+    events = []
+    while True:
+        changes = db.get_changes_since(last_id)
+        if not changes:
+            return events
+        events.extend(_sub_change_events(changes))
+        last_id = changes[-1][1]
+
+_stats_feed = feed.Topic("stats", _produce_stats, 3, replay=True)
+_subs_feed = feed.Topic("subs", _produce_subs, 2, backfill=_backfill_subs)
+
+SSE_MAX_STREAMS = max(1, int(os.getenv("SSE_MAX_STREAMS", "16")))
+_sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+def _sse_response(gen, **headers):
+    if not _sse_slots.acquire(blocking=False):
+        return Response("retry: 30000\nevent: poll\ndata: {}\n\n", content_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", **headers})
+    def _gen():
+        try:
+            yield from gen
+        finally:
+            _sse_slots.release()
+    return Response(_gen(), content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **headers})
+
+def _sub_blocked(sub):
+    now = datetime.now(timezone.utc)
+    is_expired = bool(sub.get("expire_at")) and datetime.fromisoformat(sub["expire_at"]).replace(tzinfo=timezone.utc) < now
+    is_over_limit = sub["data_gb"] > 0 and (sub.get("used_bytes") or 0) >= sub["data_gb"] * 1073741824
+    return sub.get("enabled") == 0 or is_expired or is_over_limit
+
+@jobs.handler("bulk_nodes")
+def _job_bulk_nodes(job, sub_ids):
+    node_ids = [int(n) for n in job.params.get("node_ids", [])]
+    action = job.params.get("action")
+    for sub_id in sub_ids:
+        sub = db.get_sub(sub_id)
+        if not sub:
+            job.report_one(sub_id)
+            continue
+        errors = []
+        if action == "add":
+            existing = {sn["node_id"] for sn in db.get_sub_nodes(sub_id)}
+            expiry_time = _sub_expiry_time(sub)
+            for node_id in node_ids:
+                if node_id in existing:
+                    continue
+                ni = db.get_node_inbound_with_node(node_id)
+                if not ni:
+                    continue
+                try:
+                    client_uuid = str(uuid.uuid4())
+                    xui = XUIClient(ni["address"], ni["username"], ni["password"], ni.get("proxy_url"))
+                    total_limit_bytes = _tlimit(sub["data_gb"], sub.get("used_bytes") or 0, _tmult(ni))
+                    email = f"{sub_id}-{node_id}"
+                    client = xui.make_client(email, client_uuid, expiry_time, sub.get("ip_limit", 0), sub_id, sub.get("comment") or "", total_limit_bytes)
+                    blocked = _sub_blocked(sub)
+                    if blocked:
+                        client["enable"] = False
+                    ok = xui.add_client(ni["inbound_id"], client)
+                    if ok:
+                        db.add_sub_node(sub_id, node_id, client_uuid, email)
+                        if blocked:
+                            db.set_sub_node_disabled(sub_id, node_id, True)
+                    else:
+                        errors.append(f"inbound {node_id}: failed")
+                except Exception as e:
+                    errors.append(f"inbound {node_id}: {e}")
+        elif action == "remove":
+            snodes = db.get_sub_nodes(sub_id)
+            for node_id in node_ids:
+                sn = next((s for s in snodes if s["node_id"] == node_id), None)
+                if not sn:
+                    continue
+                try:
+                    xui = XUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url"))
+                    t = xui.get_client_traffic(sn["email"])
+                    if t:
+                        raw = (t.get("up") or 0) + (t.get("down") or 0)
+                        effective = (sn.get("traffic_offset") or 0.0) + max(0, raw - (sn.get("traffic_baseline") or 0)) * _tmult(sn)
+                        db.add_sub_preserved_traffic(sub_id, effective)
+                    xui.delete_client(sn["inbound_id"], sn["client_uuid"])
+                except Exception:
+                    pass
+                db.remove_sub_node(sub_id, node_id)
+        job.report_one(sub_id, "; ".join(errors) or None)
+
+async def _apply_by_inbound(items):
+    groups = {}
+    for sn, action in items:
+        groups.setdefault(sn["xui_node_id"], {}).setdefault(sn["inbound_id"], []).append((sn, action))
+    results = {}
+    async def _call(key, coro):
+        try:
+            results[key] = None if await coro else "failed"
+        except Exception as e:
+            results[key] = str(e)
+    async def _inbound(xui, inbound_id, group):
+        inbound = await xui.get_inbound(inbound_id)
+        if not inbound:
+            raise RuntimeError("inbound not found")
+        by_email = {c.get("email"): c for c in json.loads(inbound.get("settings") or "{}").get("clients", [])}
+        calls = []
+        for sn, action in group:
+            key = (sn["sub_id"], sn["node_id"])
+            client = by_email.get(sn["email"])
+            if action == "delete":
+                if client is None:
+                    results[key] = None
+                else:
+                    calls.append(_call(key, xui.delete_client(inbound_id, client.get("id") or sn["client_uuid"])))
+            elif client is None:
+                results[key] = "client not found"
+            else:
+                old_uuid = client.get("id") or sn["client_uuid"]
+                action(sn, client)
+                calls.append(_call(key, xui.update_client(inbound_id, old_uuid, client)))
+        for call in calls:
+            await call
+    async def _guarded(xui, inbound_id, group):
+        try:
+            await _inbound(xui, inbound_id, group)
+        except Exception as e:
+            for sn, _ in group:
+                results.setdefault((sn["sub_id"], sn["node_id"]), str(e))
+    async def _node(inbounds):
+        sn = next(iter(inbounds.values()))[0][0]
+        try:
+            async with AsyncXUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url")) as xui:
+                await asyncio.gather(*[_guarded(xui, inbound_id, group) for inbound_id, group in inbounds.items()])
+        except Exception as e:
+            for group in inbounds.values():
+                for sn, _ in group:
+                    results.setdefault((sn["sub_id"], sn["node_id"]), str(e))
+    await asyncio.gather(*[_node(inbounds) for inbounds in groups.values()])
+    return results
+
+def _bulk_chunks(sub_ids, size=500):
+    for i in range(0, len(sub_ids), size):
+        yield sub_ids[i:i + size]
+
+def _bulk_report(job, sub_ids, results):
+    errors = {}
+    for (sub_id, ni_id), err in results.items():
+        if err:
+            errors.setdefault(sub_id, []).append(f"inbound {ni_id}: {err}")
+    job.report((sub_id, "; ".join(errors.get(sub_id, [])) or None) for sub_id in sub_ids)
+
+def _extend_updates(sub, add_data_gb, add_days, remove_expiry, remove_data_limit):
+    updates = {}
+    if remove_data_limit:
+        updates["data_gb"] = 0
+    elif add_data_gb != 0:
+        updates["data_gb"] = max(0, (sub.get("data_gb") or 0) + add_data_gb)
+    if remove_expiry:
+        updates["expire_at"] = None
+    elif add_days != 0:
+        try:
+            base = datetime.fromisoformat(sub["expire_at"]) if sub.get("expire_at") else (datetime.now(timezone.utc) if add_days > 0 else None)
+            if base is not None:
+                if base.tzinfo is None:
+                    base = base.replace(tzinfo=timezone.utc)
+                updates["expire_at"] = (base + timedelta(days=add_days)).isoformat()
+        except Exception:
+            if add_days > 0:
+                updates["expire_at"] = (datetime.now(timezone.utc) + timedelta(days=add_days)).isoformat()
+    return updates
+
+@jobs.handler("bulk_extend")
+def _job_bulk_extend(job, sub_ids):
+    add_data_gb = float(job.params.get("data_gb", 0))
+    add_days = int(job.params.get("days", 0))
+    remove_expiry = bool(job.params.get("remove_expiry", False))
+    remove_data_limit = bool(job.params.get("remove_data_limit", False))
+    for chunk in _bulk_chunks(sub_ids):
+        subs = {sub["id"]: sub for sub in db.get_subs_by_ids(chunk)}
+        updates = {sub_id: _extend_updates(sub, add_data_gb, add_days, remove_expiry, remove_data_limit) for sub_id, sub in subs.items()}
+        db.update_subs([(sub_id, u) for sub_id, u in updates.items() if u])
+        results = {}
+        if remove_expiry or add_days != 0:
+            def _set_expiry(sn, client):
+                sub = subs[sn["sub_id"]]
+                expire_at = updates[sn["sub_id"]].get("expire_at", sub.get("expire_at"))
+                expire_ms = 0
+                if expire_at:
+                    try:
+                        expire_ms = int(datetime.fromisoformat(expire_at).replace(tzinfo=timezone.utc).timestamp() * 1000)
+                    except Exception:
+                        pass
+                client["expiryTime"] = expire_ms
+                client["limitIp"] = sub.get("ip_limit", 0)
+            items = [(sn, _set_expiry) for sn in db.get_sub_nodes_for_subs(list(subs)) if updates.get(sn["sub_id"])]
+            results = run_async(_apply_by_inbound(items))
+        _bulk_report(job, chunk, results)
+
+@jobs.handler("bulk_delete")
+def _job_bulk_delete(job, sub_ids):
+    for chunk in _bulk_chunks(sub_ids):
+        run_async(_apply_by_inbound([(sn, "delete") for sn in db.get_sub_nodes_for_subs(chunk)]))
+        db.delete_subs(chunk)
+        job.report((sub_id, None) for sub_id in chunk)
+
+@jobs.handler("bulk_toggle")
+def _job_bulk_toggle(job, sub_ids):
+    enabled_val = bool(job.params.get("enabled", True))
+    for chunk in _bulk_chunks(sub_ids):
+        db.set_subs_enabled(chunk, enabled_val)
+        snodes = db.get_sub_nodes_for_subs(chunk)
+        if enabled_val:
+            subs = {sub["id"]: sub for sub in db.get_subs_by_ids(chunk)}
+            expiry = {sub_id: _sub_expiry_time(sub) for sub_id, sub in subs.items()}
+            def _enable(sn, client):
+                sub = subs[sn["sub_id"]]
+                client["enable"] = True
+                client["expiryTime"] = expiry[sn["sub_id"]]
+                client["limitIp"] = sub.get("ip_limit", 0)
+                client["totalGB"] = _tlimit(sub.get("data_gb") or 0, sub.get("used_bytes") or 0, _tmult(sn))
+            results = run_async(_apply_by_inbound([(sn, _enable) for sn in snodes if sn["sub_id"] in subs]))
+            db.set_sub_nodes_state([(sn["sub_id"], sn["node_id"], sn["client_uuid"], False) for sn in snodes
+                if (sn["sub_id"], sn["node_id"]) in results and results[(sn["sub_id"], sn["node_id"])] is None])
+        else:
+            new_uuids = {sub_id: str(uuid.uuid4()) for sub_id in chunk}
+            def _disable(sn, client):
+                client["id"] = new_uuids[sn["sub_id"]]
+                client["enable"] = False
+            active = [sn for sn in snodes if not sn.get("client_disabled")]
+            results = run_async(_apply_by_inbound([(sn, _disable) for sn in active]))
+            db.set_sub_nodes_state([(sub_id, ni_id, new_uuids[sub_id], True) for (sub_id, ni_id), err in results.items() if err is None])
+            def _disable_only(sn, client):
+                client["enable"] = False
+            retry = [sn for sn in active if results.get((sn["sub_id"], sn["node_id"]))]
+            if retry:
+                fallback = run_async(_apply_by_inbound([(sn, _disable_only) for sn in retry]))
+                db.set_sub_nodes_state([(sn["sub_id"], sn["node_id"], sn["client_uuid"], True) for sn in retry
+                    if fallback.get((sn["sub_id"], sn["node_id"]), "failed") is None])
+                results.update({key: err for key, err in fallback.items() if err is None})
+        _bulk_report(job, chunk, results)
+
+@jobs.handler("bulk_reset_traffic")
+def _job_bulk_reset_traffic(job, sub_ids):
+    for sub_id in sub_ids:
+        sub = db.get_sub(sub_id)
+        if not sub:
+            job.report_one(sub_id)
+            continue
+        snodes = db.get_sub_nodes(sub_id)
+        errors = []
+        for sn in snodes:
+            try:
+                xui = XUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url"))
+                xui.reset_client_traffic(sn["inbound_id"], sn["email"])
+            except Exception as e:
+                errors.append(f"inbound {sn['node_id']}: {e}")
+        db.reset_sub_traffic(sub_id)
+        now_dt = datetime.now(timezone.utc)
+        is_expired = bool(sub.get("expire_at")) and datetime.fromisoformat(sub["expire_at"]).replace(tzinfo=timezone.utc) < now_dt
+        if sub.get("enabled") != 0 and not is_expired:
+            for sn in snodes:
+                try:
+                    xui = XUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url"))
+                    xui.set_client_enabled(sn["inbound_id"], sn["client_uuid"], sn["email"], True)
+                except Exception:
+                    pass
+            db.reset_sub_node_disabled(sub_id)
+        job.report_one(sub_id, "; ".join(errors) or None)
+
 def register_routes(panel_path):
     global BASE_URL
     BASE_URL = os.getenv("BASE_URL", "")
     base_dir = os.path.dirname(os.path.abspath(__file__))
-    with open(os.path.join(base_dir, "frontend", "index.html")) as f:
-        _panel_html = f.read().replace("{{prefix}}", f"/{panel_path}").replace("{{version}}", updater.VERSION)
-    _err_pages = {}
+    sse_url = os.getenv("SSE_URL", "").rstrip("/")
+    def _fill_index(src):
+        return assets.page(assets.rewrite(src).replace("{{prefix}}", f"/{panel_path}").replace("{{version}}", updater.VERSION)
+            .replace("{{sse_prefix}}", f"{sse_url}/{panel_path}" if sse_url else "").replace("{{sse_port}}", os.getenv("SSE_PORT", "")))
+    _frontend("index.html", _fill_index)
     for code in [400, 403, 404, 405, 500]:
-        fp = os.path.join(base_dir, "frontend", f"{code}.html")
-        try:
-            with open(fp) as f:
-                _err_pages[code] = f.read()
-        except Exception:
-            _err_pages[code] = ""
+        _frontend(f"{code}.html", assets.rewrite)
+
+    if not os.getenv("SUB_PORT"):
+        app.register_blueprint(sub_bp)
 
     @app.route(f"/{panel_path}/", strict_slashes=False)
     def panel_index():
-        return _panel_html
+        return assets.respond(_frontend("index.html", _fill_index))
 
     @app.route(f"/{panel_path}/api/status")
     def api_status():
@@ -461,19 +922,22 @@ def register_routes(panel_path):
         sys_info = _sys_info()
         return jsonify({**stats, "system": sys_info})
 
+    @app.route(f"/{panel_path}/metrics")
+    def metrics_endpoint():
+        return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+    @app.route(f"/{panel_path}/api/perf")
+    def api_perf():
+        return jsonify(tracing.top(max(1, request.args.get("top", 10, type=int))))
+
+    @app.route(f"/{panel_path}/api/perf", methods=["DELETE"])
+    def api_perf_reset():
+        tracing.reset()
+        return jsonify({"ok": True})
+
     @app.route(f"/{panel_path}/api/stream")
     def api_stream():
-        def _gen():
-            while True:
-                try:
-                    stats = db.get_overview_stats()
-                    sys_info = _sys_info()
-                    yield f"data: {json.dumps({**stats, 'system': sys_info})}\n\n"
-                except Exception:
-                    pass
-                time.sleep(3)
-        return Response(_gen(), content_type="text/event-stream",
-            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        return _sse_response(_stats_feed.stream())
 
     @app.route(f"/{panel_path}/api/subscriptions")
     def api_subs_list():
@@ -493,40 +957,16 @@ def register_routes(panel_path):
         filter_data_usage = request.args.get("filter_data_usage", "").strip() or None
         expiring_days = int(request.args["expiring_days"]) if request.args.get("expiring_days") else None
         subs, total = db.get_subs(page, per_page, search, sort_by, sort_dir, filter_status, data_above_gb, data_below_gb, tag, filter_enabled, filter_nodes, filter_data_usage, expiring_days)
+        names = db.get_sub_node_names([sub["id"] for sub in subs])
         for sub in subs:
-            sub["node_names"] = [sn.get("inbound_name") or sn["name"] for sn in db.get_sub_nodes(sub["id"])]
+            sub["node_names"] = names.get(sub["id"], [])
         return jsonify({"subs": subs, "total": total, "page": page, "per_page": per_page})
 
     @app.route(f"/{panel_path}/api/subscriptions/stream")
     def api_subs_stream():
-        def _gen():
-            prev = {}
-            first = True
-            while True:
-                try:
-                    subs, _ = db.get_subs(1, 0)
-                    for sub in subs:
-                        sub["node_names"] = [sn.get("inbound_name") or sn["name"] for sn in db.get_sub_nodes(sub["id"])]
-                    curr = {s["id"]: s for s in subs}
-                    changed = False
-                    if not first:
-                        for sid in set(prev.keys()) - set(curr.keys()):
-                            yield f"data: {json.dumps({'type': 'delete', 'id': sid})}\n\n"
-                            changed = True
-                        for sid, sub in curr.items():
-                            h = json.dumps({k: sub.get(k) for k in ["used_bytes", "expire_at", "enabled", "data_gb", "comment", "node_names", "ip_limit", "expire_after_first_use_seconds"]}, sort_keys=True)
-                            if prev.get(sid) != h:
-                                yield f"data: {json.dumps({'type': 'update', 'sub': sub})}\n\n"
-                                changed = True
-                        if not changed:
-                            yield ": heartbeat\n\n"
-                    first = False
-                    prev = {sid: json.dumps({k: curr[sid].get(k) for k in ["used_bytes", "expire_at", "enabled", "data_gb", "comment", "node_names", "ip_limit", "expire_after_first_use_seconds"]}, sort_keys=True) for sid in curr}
-                except Exception:
-                    pass
-                time.sleep(5)
-        return Response(_gen(), content_type="text/event-stream",
-            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+        last_id = int(last_id) if last_id and last_id.isdigit() else None
+        return _sse_response(_subs_feed.stream(last_id=last_id))
 
     @app.route(f"/{panel_path}/api/tags")
     def api_tags():
@@ -558,23 +998,21 @@ def register_routes(panel_path):
         expire_after = int(sub.get("expire_after_first_use_seconds") or 0)
         expiry_time = -expire_after if expire_after>0 and not sub.get("expire_at") else expire_ms
         errors = []
+        expiry_time = -expire_after_first_use_seconds*1000 if expire_after_first_use_seconds>0 else expire_ms
+        items = []
         for node_id in node_ids:
             ni = db.get_node_inbound_with_node(node_id)
             if not ni:
                 continue
-            try:
-                xui = XUIClient(ni["address"], ni["username"], ni["password"], ni.get("proxy_url"))
-                total_limit_bytes = _tlimit(data_gb, sub.get("used_bytes") or 0, _tmult(ni))
-                email = f"{sub_id}-{node_id}"
-                expiry_time = -expire_after_first_use_seconds*1000 if expire_after_first_use_seconds>0 else expire_ms
-                client = xui.make_client(email, client_uuid, expiry_time, ip_limit, sub_id, comment or "", total_limit_bytes)
-                ok = xui.add_client(ni["inbound_id"], client)
-                if ok:
-                    db.add_sub_node(sub_id, node_id, client_uuid, email)
-                else:
-                    errors.append(f"inbound {node_id}: failed to add client")
-            except Exception as e:
-                errors.append(f"inbound {node_id}: {e}")
+            total_limit_bytes = _tlimit(data_gb, sub.get("used_bytes") or 0, _tmult(ni))
+            items.append((ni, XUIClient.make_client(f"{sub_id}-{node_id}", client_uuid, expiry_time, ip_limit, sub_id, comment or "", total_limit_bytes)))
+        for (ni, client), ok in zip(items, run_async(add_clients_by_node(items)) if items else []):
+            if isinstance(ok, Exception):
+                errors.append(f"inbound {ni['id']}: {ok}")
+            elif ok:
+                db.add_sub_node(sub_id, ni["id"], client_uuid, client["email"])
+            else:
+                errors.append(f"inbound {ni['id']}: failed to add client")
         base_url = BASE_URL or request.host_url.rstrip("/")
         return jsonify({"id": sub_id, "uuid": client_uuid, "url": f"{base_url}/sub/{sub_id}", "errors": errors})
 
@@ -778,177 +1216,31 @@ def register_routes(panel_path):
     @app.route(f"/{panel_path}/api/bulk/nodes", methods=["POST"])
     def api_bulk_nodes():
         data = request.json
-        sub_ids = data.get("sub_ids", [])
-        node_ids = [int(n) for n in data.get("node_ids", [])]
-        action = data.get("action")
-        errors = []
-        for sub_id in sub_ids:
-            sub = db.get_sub(sub_id)
-            if not sub:
-                continue
-            if action == "add":
-                existing = {sn["node_id"] for sn in db.get_sub_nodes(sub_id)}
-                expire_ms = 0
-                if sub.get("expire_at"):
-                    try:
-                        expire_ms = int(datetime.fromisoformat(sub["expire_at"]).replace(tzinfo=timezone.utc).timestamp() * 1000)
-                    except Exception:
-                        pass
-                expire_after = int(sub.get("expire_after_first_use_seconds") or 0)
-                expiry_time = -expire_after if expire_after>0 and not sub.get("expire_at") else expire_ms
-                for node_id in node_ids:
-                    if node_id in existing:
-                        continue
-                    ni = db.get_node_inbound_with_node(node_id)
-                    if not ni:
-                        continue
-                    try:
-                        client_uuid = str(uuid.uuid4())
-                        xui = XUIClient(ni["address"], ni["username"], ni["password"], ni.get("proxy_url"))
-                        total_limit_bytes = _tlimit(sub["data_gb"], sub.get("used_bytes") or 0, _tmult(ni))
-                        email = f"{sub_id}-{node_id}"
-                        client = xui.make_client(email, client_uuid, expiry_time, sub.get("ip_limit", 0), sub_id, sub.get("comment") or "", total_limit_bytes)
-                        now = datetime.now(timezone.utc)
-                        is_disabled = sub.get("enabled") == 0
-                        is_expired = sub.get("expire_at") and datetime.fromisoformat(sub["expire_at"]).replace(tzinfo=timezone.utc) < now
-                        is_over_limit = sub["data_gb"] > 0 and (sub.get("used_bytes") or 0) >= sub["data_gb"] * 1073741824
-                        if is_disabled or is_expired or is_over_limit:
-                            client["enable"] = False
-                        ok = xui.add_client(ni["inbound_id"], client)
-                        if ok:
-                            db.add_sub_node(sub_id, node_id, client_uuid, email)
-                            if is_disabled or is_expired or is_over_limit:
-                                db.set_sub_node_disabled(sub_id, node_id, True)
-                        else:
-                            errors.append(f"{sub_id}/inbound {node_id}: failed")
-                    except Exception as e:
-                        errors.append(f"{sub_id}/inbound {node_id}: {e}")
-            elif action == "remove":
-                snodes = db.get_sub_nodes(sub_id)
-                for node_id in node_ids:
-                    sn = next((s for s in snodes if s["node_id"] == node_id), None)
-                    if not sn:
-                        continue
-                    try:
-                        xui = XUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url"))
-                        t = xui.get_client_traffic(sn["email"])
-                        if t:
-                            raw = (t.get("up") or 0) + (t.get("down") or 0)
-                            effective = (sn.get("traffic_offset") or 0.0) + max(0, raw - (sn.get("traffic_baseline") or 0)) * _tmult(sn)
-                            db.add_sub_preserved_traffic(sub_id, effective)
-                        xui.delete_client(sn["inbound_id"], sn["client_uuid"])
-                    except Exception:
-                        pass
-                    db.remove_sub_node(sub_id, node_id)
-        return jsonify({"ok": True, "errors": errors})
+        job_id = jobs.submit("bulk_nodes", {"node_ids": [int(n) for n in data.get("node_ids", [])], "action": data.get("action")}, data.get("sub_ids", []))
+        return jsonify({"ok": True, "job_id": job_id})
 
     @app.route(f"/{panel_path}/api/bulk/extend", methods=["POST"])
     def api_bulk_extend():
         data = request.json
-        sub_ids = data.get("sub_ids", [])
-        add_data_gb = float(data.get("data_gb", 0))
-        add_days = int(data.get("days", 0))
-        remove_expiry = bool(data.get("remove_expiry", False))
-        remove_data_limit = bool(data.get("remove_data_limit", False))
-        for sub_id in sub_ids:
-            sub = db.get_sub(sub_id)
-            if not sub:
-                continue
-            updates = {}
-            if remove_data_limit:
-                updates["data_gb"] = 0
-            elif add_data_gb != 0:
-                updates["data_gb"] = max(0, (sub.get("data_gb") or 0) + add_data_gb)
-            if remove_expiry:
-                updates["expire_at"] = None
-            elif add_days != 0:
-                try:
-                    base = datetime.fromisoformat(sub["expire_at"]) if sub.get("expire_at") else (datetime.now(timezone.utc) if add_days > 0 else None)
-                    if base is not None:
-                        if base.tzinfo is None:
-                            base = base.replace(tzinfo=timezone.utc)
-                        updates["expire_at"] = (base + timedelta(days=add_days)).isoformat()
-                except Exception:
-                    if add_days > 0:
-                        updates["expire_at"] = (datetime.now(timezone.utc) + timedelta(days=add_days)).isoformat()
-            if updates:
-                db.update_sub(sub_id, **updates)
-                if remove_expiry or add_days != 0:
-                    updated_sub = db.get_sub(sub_id)
-                    expire_ms = 0
-                    if updated_sub and updated_sub.get("expire_at"):
-                        try:
-                            expire_ms = int(datetime.fromisoformat(updated_sub["expire_at"]).replace(tzinfo=timezone.utc).timestamp() * 1000)
-                        except Exception:
-                            pass
-                    for sn in db.get_sub_nodes(sub_id):
-                        try:
-                            xui = XUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url"))
-                            xui.update_client_expiry_ip(sn["inbound_id"], sn["client_uuid"], sn["email"], expire_ms, updated_sub.get("ip_limit", 0))
-                        except Exception:
-                            pass
-        return jsonify({"ok": True})
+        params = {k: data[k] for k in ("data_gb", "days", "remove_expiry", "remove_data_limit") if k in data}
+        return jsonify({"ok": True, "job_id": jobs.submit("bulk_extend", params, data.get("sub_ids", []))})
 
     @app.route(f"/{panel_path}/api/bulk/delete", methods=["POST"])
     def api_bulk_delete():
         sub_ids = request.json.get("sub_ids", [])
-        for sub_id in sub_ids:
-            snodes = db.get_sub_nodes(sub_id)
-            for sn in snodes:
-                try:
-                    xui = XUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url"))
-                    xui.delete_client(sn["inbound_id"], sn["client_uuid"])
-                except Exception:
-                    pass
-            db.delete_sub(sub_id)
-        return jsonify({"ok": True, "deleted": len(sub_ids)})
+        return jsonify({"ok": True, "deleted": len(sub_ids), "job_id": jobs.submit("bulk_delete", {}, sub_ids)})
 
     @app.route(f"/{panel_path}/api/bulk/toggle", methods=["POST"])
     def api_bulk_toggle():
         data = request.json
-        sub_ids = data.get("sub_ids", [])
-        enabled_val = bool(data.get("enabled", True))
-        for sub_id in sub_ids:
-            db.update_sub(sub_id, enabled=1 if enabled_val else 0)
-            snodes = db.get_sub_nodes(sub_id)
-            if enabled_val:
-                sub = db.get_sub(sub_id)
-                expiry_time = _sub_expiry_time(sub)
-                ip_limit = sub.get("ip_limit", 0) if sub else 0
-                for sn in snodes:
-                    try:
-                        xui = XUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url"))
-                        ok = xui.sync_client(sn["inbound_id"], sn["client_uuid"], sn["email"], enabled=True, expire_ms=expiry_time, ip_limit=ip_limit, total_limit_bytes=_tlimit(sub.get("data_gb") or 0, sub.get("used_bytes") or 0, _tmult(sn)))
-                        if ok:
-                            db.set_sub_node_disabled(sub_id, sn["node_id"], False)
-                    except Exception:
-                        pass
-            else:
-                new_uuid = str(uuid.uuid4())
-                for sn in snodes:
-                    if sn.get("client_disabled"):
-                        continue
-                    try:
-                        xui = XUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url"))
-                        ok = xui.rotate_client_uuid(sn["inbound_id"], sn["client_uuid"], sn["email"], new_uuid, enabled=False)
-                        if ok:
-                            db.update_sub_node_uuid(sub_id, sn["node_id"], new_uuid)
-                            db.set_sub_node_disabled(sub_id, sn["node_id"], True)
-                        else:
-                            ok2 = xui.set_client_enabled(sn["inbound_id"], sn["client_uuid"], sn["email"], False)
-                            if ok2:
-                                db.set_sub_node_disabled(sub_id, sn["node_id"], True)
-                    except Exception:
-                        pass
-        return jsonify({"ok": True})
+        return jsonify({"ok": True, "job_id": jobs.submit("bulk_toggle", {"enabled": bool(data.get("enabled", True))}, data.get("sub_ids", []))})
 
     @app.route(f"/{panel_path}/api/bulk/note", methods=["POST"])
     def api_bulk_note():
         data = request.json
         sub_ids = data.get("sub_ids", [])
         note = data.get("note") or None
-        for sub_id in sub_ids:
-            db.update_sub(sub_id, note=note)
+        db.set_subs_note(sub_ids, note)
         return jsonify({"ok": True})
 
     @app.route(f"/{panel_path}/api/bulk/data", methods=["POST"])
@@ -959,12 +1251,7 @@ def register_routes(panel_path):
         action = data.get("action")
         if factor <= 0 or action not in ("multiply", "divide"):
             return jsonify({"error": "invalid input"}), 400
-        for sub_id in sub_ids:
-            sub = db.get_sub(sub_id)
-            if not sub or not sub.get("data_gb"):
-                continue
-            new_gb = sub["data_gb"] * factor if action == "multiply" else sub["data_gb"] / factor
-            db.update_sub(sub_id, data_gb=max(0, round(new_gb, 2)))
+        db.scale_subs_data(sub_ids, factor, divide=action == "divide")
         return jsonify({"ok": True})
 
     @app.route(f"/{panel_path}/api/bulk/tags", methods=["POST"])
@@ -975,16 +1262,7 @@ def register_routes(panel_path):
         action = data.get("action")
         if not tag or action not in ("add", "remove"):
             return jsonify({"error": "invalid input"}), 400
-        for sub_id in sub_ids:
-            sub = db.get_sub(sub_id)
-            if not sub:
-                continue
-            tags = sub.get("tags") if isinstance(sub.get("tags"), list) else []
-            if action == "add" and tag not in tags:
-                tags.append(tag)
-            elif action == "remove" and tag in tags:
-                tags.remove(tag)
-            db.update_sub(sub_id, tags=tags)
+        db.edit_subs_tag(sub_ids, tag, action)
         return jsonify({"ok": True})
 
     @app.route(f"/{panel_path}/api/subscriptions/<sub_id>/regen-id", methods=["POST"])
@@ -1027,29 +1305,24 @@ def register_routes(panel_path):
     @app.route(f"/{panel_path}/api/bulk/reset-traffic", methods=["POST"])
     def api_bulk_reset_traffic():
         sub_ids = request.json.get("sub_ids", [])
-        for sub_id in sub_ids:
-            sub = db.get_sub(sub_id)
-            if not sub:
-                continue
-            snodes = db.get_sub_nodes(sub_id)
-            for sn in snodes:
-                try:
-                    xui = XUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url"))
-                    xui.reset_client_traffic(sn["inbound_id"], sn["email"])
-                except Exception:
-                    pass
-            db.reset_sub_traffic(sub_id)
-            now_dt = datetime.now(timezone.utc)
-            is_expired = bool(sub.get("expire_at")) and datetime.fromisoformat(sub["expire_at"]).replace(tzinfo=timezone.utc) < now_dt
-            if sub.get("enabled") != 0 and not is_expired:
-                for sn in snodes:
-                    try:
-                        xui = XUIClient(sn["address"], sn["username"], sn["password"], sn.get("proxy_url"))
-                        xui.set_client_enabled(sn["inbound_id"], sn["client_uuid"], sn["email"], True)
-                    except Exception:
-                        pass
-                db.reset_sub_node_disabled(sub_id)
-        return jsonify({"ok": True, "count": len(sub_ids)})
+        return jsonify({"ok": True, "count": len(sub_ids), "job_id": jobs.submit("bulk_reset_traffic", {}, sub_ids)})
+
+    @app.route(f"/{panel_path}/api/jobs")
+    def api_jobs_list():
+        return jsonify(db.get_jobs(min(100, max(1, request.args.get("limit", 20, type=int)))))
+
+    @app.route(f"/{panel_path}/api/jobs/<job_id>")
+    def api_job_get(job_id):
+        job = db.get_job(job_id)
+        if not job:
+            return jsonify({"error": "not found"}), 404
+        return jsonify(job)
+
+    @app.route(f"/{panel_path}/api/jobs/<job_id>/stream")
+    def api_job_stream(job_id):
+        if not db.get_job(job_id):
+            return jsonify({"error": "not found"}), 404
+        return _sse_response(jobs.stream(job_id))
 
     @app.route(f"/{panel_path}/api/subscriptions/<sub_id>/reset-traffic", methods=["POST"])
     def api_sub_reset_traffic(sub_id):
@@ -1084,14 +1357,7 @@ def register_routes(panel_path):
     def api_sub_qr(sub_id):
         base_url = BASE_URL or request.host_url.rstrip("/")
         sub_url = f"{base_url}/sub/{sub_id}"
-        qr = qrcode.QRCode(box_size=6, border=2)
-        qr.add_data(sub_url)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="#00e5a0", back_color="#1a1d2e")
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        buf.seek(0)
-        return Response(buf.read(), content_type="image/png")
+        return Response(qr.png(sub_url), content_type="image/png")
 
     @app.route(f"/{panel_path}/api/subscriptions/<sub_id>/configs")
     def api_sub_configs(sub_id):
@@ -1105,6 +1371,7 @@ def register_routes(panel_path):
         for n in nodes:
             n.pop("password", None)
             n["inbounds"] = db.get_node_inbounds(n["id"])
+            n["breaker"] = breaker_state(n["address"])
         return jsonify(nodes)
 
     @app.route(f"/{panel_path}/api/nodes/reorder", methods=["PUT"])
@@ -1261,6 +1528,7 @@ def register_routes(panel_path):
         node = db.get_node(node_id)
         if not node:
             return jsonify({"ok": False, "error": "not found"}), 404
+        reset_breaker(node["address"])
         try:
             xui = XUIClient(node["address"], node["username"], node["password"], node.get("proxy_url"))
             ok = xui.test_connection()
@@ -1287,6 +1555,7 @@ def register_routes(panel_path):
         ni = db.get_node_inbound_with_node(ni_id)
         if not ni:
             return jsonify({"ok": False, "error": "not found"}), 404
+        reset_breaker(ni["address"])
         try:
             xui = XUIClient(ni["address"], ni["username"], ni["password"], ni.get("proxy_url"))
             ok = xui.test_connection()
@@ -1368,11 +1637,11 @@ def register_routes(panel_path):
                             time.sleep(0.5)
             except Exception:
                 pass
-        return Response(_gen(), content_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+        return _sse_response(_gen())
 
     def _err(code):
         if request.path.startswith(f"/{panel_path}"):
-            return _err_pages.get(code, ""), code
+            return _frontend(f"{code}.html", assets.rewrite), code
         return "", code
 
     @app.errorhandler(400)
@@ -0,0 +1,58 @@
+import io
+import os
+import base64
+import hashlib
+import qrcode
+import metrics
+import tracing
+from cache import LRU
+
+_lookups = metrics.counter("ghostgate_qr_cache_total", "QR code cache lookups by tier and result", ("tier", "result"))
+
+_FILL = "#00e5a0"
+_BACK = "#1a1d2e"
+
+_mem = LRU(int(os.getenv("QR_CACHE_SIZE", "2048")), float("inf"))
+
+def _render(text, box_size, border, fill, back):
+    with tracing.span("render", "qr"):
+        q = qrcode.QRCode(box_size=box_size, border=border)
+        q.add_data(text)
+        q.make(fit=True)
+        img = q.make_image(fill_color=fill, back_color=back)
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue()
+
+def png(text, box_size=6, border=2, fill=_FILL, back=_BACK):
+    key = hashlib.sha256(f"{box_size}|{border}|{fill}|{back}|{text}".encode()).hexdigest()
+    data = _mem.get(key)
+    if data is not None:
+        _lookups.inc(tier="memory", result="hit")
+        return data
+    cache_dir = os.getenv("QR_CACHE_DIR")
+    path = os.path.join(cache_dir, key[:2], f"{key}.png") if cache_dir else None
+    if path:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            _lookups.inc(tier="disk", result="hit")
+        except OSError:
+            data = None
+    if data is None:
+        _lookups.inc(tier="memory" if not path else "disk", result="miss")
+        data = _render(text, box_size, border, fill, back)
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except OSError:
+                pass
+    _mem.set(key, data)
+    return data
+
+def b64(text, box_size=6):
+    return base64.b64encode(png(text, box_size)).decode()
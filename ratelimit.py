@@ -0,0 +1,30 @@
+import time
+import threading
+from collections import OrderedDict
+import metrics
+
+_throttled = metrics.counter("ghostgate_rate_limited_total", "Requests rejected by a token-bucket limiter", ("limiter",))
+
+class TokenBucket:
+    def __init__(self, name, rate, burst, size=65536):
+        self.name = name
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.size = size
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - ts) * self.rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / self.rate
+            self._buckets[key] = (tokens - 1 if tokens >= 1 else tokens, now)
+            while len(self._buckets) > self.size:
+                self._buckets.popitem(last=False)
+        if wait:
+            _throttled.inc(limiter=self.name)
+        return wait
@@ -0,0 +1,117 @@
+import os
+import re
+import time
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit, parse_qs
+import metrics
+
+logger = logging.getLogger("sse")
+
+_connections = metrics.gauge("ghostgate_sse_connections", "Open SSE connections on the event-driven listener", ("stream",))
+
+_HEADERS = (
+    "HTTP/1.1 200 OK\r\n"
+    "Content-Type: text/event-stream\r\n"
+    "Cache-Control: no-cache\r\n"
+    "X-Accel-Buffering: no\r\n"
+    "Connection: close\r\n"
+)
+
+async def log_stream():
+    log_file = os.getenv("LOG_FILE", "/var/log/ghostgate.log")
+    try:
+        with open(log_file) as f:
+            f.seek(0, 2)
+            last_send = time.time()
+            while True:
+                line = f.readline()
+                if line:
+                    yield f"data: {line.rstrip()}\n\n"
+                    last_send = time.time()
+                else:
+                    if time.time() - last_send >= 10:
+                        yield ": heartbeat\n\n"
+                        last_send = time.time()
+                    await asyncio.sleep(0.5)
+    except Exception:
+        pass
+
+def _routes(panel_path):
+    import jobs
+    import panel
+    base = re.escape(f"/{panel_path}/api")
+    def _last_id(headers, query):
+        v = headers.get("last-event-id") or (query.get("last_event_id") or [""])[0]
+        return int(v) if v.isdigit() else None
+    return [
+        ("stats", re.compile(rf"^{base}/stream$"), lambda m, h, q: panel._stats_feed.astream()),
+        ("subs", re.compile(rf"^{base}/subscriptions/stream$"), lambda m, h, q: panel._subs_feed.astream(last_id=_last_id(h, q))),
+        ("logs", re.compile(rf"^{base}/logs/stream$"), lambda m, h, q: log_stream()),
+        ("job", re.compile(rf"^{base}/jobs/([^/]+)/stream$"), lambda m, h, q: jobs.astream(m.group(1))),
+    ]
+
+def _cors(headers):
+    origin = headers.get("origin", "")
+    if origin and urlsplit(origin).hostname == urlsplit(f"//{headers.get('host', '')}").hostname:
+        return f"Access-Control-Allow-Origin: {origin}\r\nVary: Origin\r\n"
+    return ""
+
+async def _watch_eof(reader, task):
+    try:
+        while await reader.read(1024):
+            pass
+    except Exception:
+        pass
+    task.cancel()
+
+async def _handle(routes, reader, writer):
+    gen, name, watcher = None, None, None
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {k.strip().lower(): v.strip() for k, v in (l.split(":", 1) for l in lines[1:] if ":" in l)}
+        url = urlsplit(target)
+        for name, rx, factory in routes:
+            m = rx.match(url.path)
+            if m and method == "GET":
+                gen = factory(m, headers, parse_qs(url.query))
+                break
+        if gen is None:
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            return
+        _connections.inc(stream=name)
+        watcher = asyncio.ensure_future(_watch_eof(reader, asyncio.current_task()))
+        writer.write((_HEADERS + _cors(headers) + "\r\n").encode())
+        await writer.drain()
+        async for chunk in gen:
+            writer.write(chunk.encode())
+            await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.CancelledError, ConnectionError, ValueError):
+        pass
+    except Exception as e:
+        logger.warning(f"sse connection error: {e}")
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if gen is not None:
+            _connections.dec(stream=name)
+            try:
+                await gen.aclose()
+            except Exception:
+                pass
+        writer.close()
+
+def start(host, port, panel_path):
+    routes = _routes(panel_path)
+    async def _main():
+        server = await asyncio.start_server(lambda r, w: _handle(routes, r, w), host, port, limit=16384)
+        logger.info(f"SSE listener running at http://{host}:{port}/{panel_path}/")
+        async with server:
+            await server.serve_forever()
+    t = threading.Thread(target=asyncio.run, args=(_main(),), name="sse", daemon=True)
+    t.start()
+    return t
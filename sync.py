@@ -5,10 +5,22 @@ import logging
 import uuid
 from datetime import datetime, timezone
 import database as db
+import metrics
 from xui_client import XUIClient
 
 logger = logging.getLogger("sync")
 
+_cycle_seconds = metrics.histogram("ghostgate_sync_cycle_seconds", "Duration of a full sync cycle")
+_cycles = metrics.counter("ghostgate_sync_cycles_total", "Sync cycles by result", ("result",))
+_last_cycle = metrics.gauge("ghostgate_sync_last_cycle_timestamp_seconds", "Unix time the last sync cycle finished")
+_last_duration = metrics.gauge("ghostgate_sync_last_cycle_duration_seconds", "Duration of the last sync cycle")
+_interval = metrics.gauge("ghostgate_sync_interval_seconds", "Configured pause between sync cycles")
+_cycle_calls = metrics.gauge("ghostgate_sync_cycle_xui_requests", "3x-ui requests made per node during the last usage sync", ("node",))
+_db_writes = metrics.counter("ghostgate_sync_db_writes_total", "Database writes made by sync", ("kind",))
+_xui_writes = metrics.counter("ghostgate_sync_xui_writes_total", "Client updates pushed to 3x-ui by sync", ("op", "result"))
+_disables = metrics.counter("ghostgate_sync_disables_total", "Sub-node clients disabled by sync", ("reason",))
+_subs = metrics.gauge("ghostgate_subs", "Subscriptions by state as of the last sync cycle", ("state",))
+
 def _ghostgate_restart_enabled():
     return os.getenv("GHOSTGATE_RESTART_OVERLIMIT_EXPIRED", "false").lower() == "true"
 
@@ -35,6 +47,7 @@ def _sync_once():
     _xui_sessions = {}
     _xui_failed = set()
     restart_keys = set()
+    states = {"active": 0, "disabled": 0, "expired": 0, "over_limit": 0}
     for sub in subs:
         sid = sub["id"]
         snodes = nodes_by_sub.get(sid, [])
@@ -69,13 +82,16 @@ def _sync_once():
         traffic_changed = total_effective != prev_used
         if traffic_changed:
             db.update_sub(sid, used_bytes=total_effective)
+            _db_writes.inc(kind="usage")
         limit_bytes = int(sub["data_gb"] * 1073741824) if sub["data_gb"] > 0 else 0
         now = datetime.now(timezone.utc)
         is_expired = bool(sub.get("expire_at")) and datetime.fromisoformat(sub["expire_at"]).replace(tzinfo=timezone.utc) < now
         is_over_limit = limit_bytes > 0 and total_effective >= limit_bytes
+        states["disabled" if sub.get("enabled") == 0 else "expired" if is_expired else "over_limit" if is_over_limit else "active"] += 1
         if sub.get("enabled") == 0:
             pass
         elif is_expired or is_over_limit:
+            reason = "expired" if is_expired else "over_limit"
             new_uuid = str(uuid.uuid4())
             for sn in snodes:
                 if sn.get("client_disabled"):
@@ -85,15 +101,21 @@ def _sync_once():
                     continue
                 try:
                     ok = xui.rotate_client_uuid(sn["inbound_id"], sn["client_uuid"], sn["email"], new_uuid, enabled=False)
+                    _xui_writes.inc(op="rotate_disable", result="ok" if ok else "failed")
                     if ok:
                         db.update_sub_node_uuid(sid, sn["node_id"], new_uuid)
                         db.set_sub_node_disabled(sid, sn["node_id"], True)
+                        _db_writes.inc(2, kind="disable")
+                        _disables.inc(reason=reason)
                         if _ghostgate_restart_enabled():
                             restart_keys.add((sn["address"], sn["username"]))
                     else:
                         ok2 = xui.set_client_enabled(sn["inbound_id"], sn["client_uuid"], sn["email"], False)
+                        _xui_writes.inc(op="disable", result="ok" if ok2 else "failed")
                         if ok2:
                             db.set_sub_node_disabled(sid, sn["node_id"], True)
+                            _db_writes.inc(kind="disable")
+                            _disables.inc(reason=reason)
                             if _ghostgate_restart_enabled():
                                 restart_keys.add((sn["address"], sn["username"]))
                 except Exception as e:
@@ -111,15 +133,23 @@ def _sync_once():
                 if sn.get("client_disabled"):
                     try:
                         ok = xui.sync_client(sn["inbound_id"], sn["client_uuid"], sn["email"], enabled=True, expire_ms=expiry_time, ip_limit=ip_limit, total_limit_bytes=node_limit)
+                        _xui_writes.inc(op="enable", result="ok" if ok else "failed")
                         if ok:
                             db.set_sub_node_disabled(sid, sn["node_id"], False)
+                            _db_writes.inc(kind="enable")
                     except Exception as e:
                         logger.warning(f"re-enable error node {sn['node_id']} sub {sid}: {e}")
                 if limit_bytes > 0 and traffic_changed:
                     try:
-                        xui.update_client_limit(sn["inbound_id"], sn["client_uuid"], sn["email"], node_limit)
+                        ok = xui.update_client_limit(sn["inbound_id"], sn["client_uuid"], sn["email"], node_limit)
+                        _xui_writes.inc(op="limit", result="ok" if ok else "failed")
                     except Exception as e:
                         logger.warning(f"limit update error node {sn['node_id']} sub {sid}: {e}")
+    for k, v in states.items():
+        _subs.set(v, state=k)
+    _cycle_calls.clear()
+    for key, xui in _xui_sessions.items():
+        _cycle_calls.inc(xui.calls, node=xui.base)
     if restart_keys:
         for key in restart_keys:
             xui = _xui_sessions.get(key)
@@ -198,13 +228,24 @@ def _sync_first_use_expiry():
                     logger.warning(f"sync expiry to node {sn['node_id']} sub {sid}: {e}")
 
 def start_sync(interval=20):
+    _interval.set(interval)
     def _loop():
         while True:
+            t0 = time.perf_counter()
             try:
                 _sync_once()
                 _sync_first_use_expiry()
+                db.prune_change_log()
+                _cycles.inc(result="ok")
             except Exception as e:
+                _cycles.inc(result="error")
                 logger.error(f"sync loop error: {e}")
+            elapsed = time.perf_counter() - t0
+            _cycle_seconds.observe(elapsed)
+            _last_duration.set(elapsed)
+            _last_cycle.set(time.time())
+            if elapsed > interval:
+                logger.warning(f"sync cycle took {elapsed:.1f}s, longer than the {interval}s interval")
             time.sleep(interval)
     t = threading.Thread(target=_loop, daemon=True)
     t.start()
@@ -0,0 +1,87 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger("trace")
+
+_local = threading.local()
+_lock = threading.Lock()
+_stats = {}
+
+def _slow_ms():
+    return float(os.getenv("SLOW_REQUEST_MS", "1000"))
+
+def _samples():
+    return int(os.getenv("TRACE_SAMPLES", "1000"))
+
+def _record(kind, name, seconds):
+    key = (kind, name)
+    with _lock:
+        st = _stats.get(key)
+        if st is None:
+            st = _stats[key] = {"count": 0, "total": 0.0, "max": 0.0, "recent": deque(maxlen=_samples())}
+        st["count"] += 1
+        st["total"] += seconds
+        st["max"] = max(st["max"], seconds)
+        st["recent"].append(seconds)
+
+@contextmanager
+def span(kind, name):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        _record(kind, name, elapsed)
+        spans = getattr(_local, "spans", None)
+        if spans is not None:
+            spans.append((kind, name, elapsed))
+
+def begin_request():
+    _local.spans = []
+    _local.started = time.perf_counter()
+
+def end_request(method, route, status):
+    spans = getattr(_local, "spans", None)
+    started = getattr(_local, "started", None)
+    _local.spans = None
+    if spans is None or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    _record("route", f"{method} {route}", elapsed)
+    if elapsed * 1000 < _slow_ms():
+        return
+    by_kind = {}
+    for kind, _, secs in spans:
+        total, n = by_kind.get(kind, (0.0, 0))
+        by_kind[kind] = (total + secs, n + 1)
+    parts = ", ".join(f"{k} {t*1000:.0f}ms x{n}" for k, (t, n) in sorted(by_kind.items()))
+    worst = max(spans, key=lambda s: s[2]) if spans else None
+    logger.warning(f"slow request {method} {route} -> {status} in {elapsed*1000:.0f}ms ({parts or 'no spans'})"
+        + (f"; slowest {worst[0]} {worst[1]} {worst[2]*1000:.0f}ms" if worst else ""))
+
+def _pct(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(round(p / 100 * (len(sorted_vals) - 1))))]
+
+def top(n=10):
+    with _lock:
+        items = [(k, st["count"], st["total"], st["max"], sorted(st["recent"])) for k, st in _stats.items()]
+    out = {}
+    for (kind, name), count, total, mx, vals in items:
+        out.setdefault(kind, []).append({
+            "name": name, "count": count, "avg_ms": round(total / count * 1000, 2),
+            "p50_ms": round(_pct(vals, 50) * 1000, 2), "p95_ms": round(_pct(vals, 95) * 1000, 2),
+            "p99_ms": round(_pct(vals, 99) * 1000, 2), "max_ms": round(mx * 1000, 2)
+        })
+    for kind in out:
+        out[kind] = sorted(out[kind], key=lambda e: e["p95_ms"], reverse=True)[:n]
+    return out
+
+def reset():
+    with _lock:
+        _stats.clear()
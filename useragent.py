@@ -0,0 +1,21 @@
+import re
+from functools import lru_cache
+
+_CLIENTS = [
+    ("clash", "clash", r"clash|mihomo|stash"),
+    ("sing-box", "sing-box", r"sing-?box|\bSF[AIMT]/"),
+    ("universal", "text", r"hiddify|karing|nekobox|nekoray|happ|v2box|streisand"),
+    ("xray", "text", r"xray|v2rayn|v2rayng|foxray|shadowrocket|quantumult|loon|surge|v2ray"),
+]
+_FORMATS = {name.replace("-", "_"): fmt for name, fmt, _ in _CLIENTS}
+_CLIENT_RE = re.compile("|".join(f"(?P<{name.replace('-', '_')}>{rx})" for name, _, rx in _CLIENTS), re.IGNORECASE)
+_BROWSER_RE = re.compile(r"Mozilla|Chrome|Safari|Firefox|Edge|Opera")
+
+@lru_cache(maxsize=4096)
+def classify(ua):
+    m = _CLIENT_RE.search(ua or "")
+    if m:
+        return m.lastgroup.replace("_", "-"), _FORMATS[m.lastgroup]
+    if _BROWSER_RE.search(ua or ""):
+        return "browser", "html"
+    return "unknown", "text"
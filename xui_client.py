@@ -1,55 +1,168 @@
+import os
+import re
+import time
+import asyncio
+import threading
+import weakref
+import httpx
 import requests
 import json
 import urllib3
+import metrics
+import tracing
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+_xui_requests = metrics.counter("ghostgate_xui_requests_total", "3x-ui API requests by node, operation and outcome", ("node", "op", "status"))
+_xui_latency = metrics.histogram("ghostgate_xui_request_seconds", "3x-ui API request latency by node and operation", ("node", "op"))
+_OP_RE = re.compile(r"/(login|get|addClient|updateClient|delClient|getClientTraffics|resetClientTraffic|restartXray\w*)(?:/|$)")
+
+def _op(path):
+    m = _OP_RE.search(path)
+    return m.group(1) if m else "other"
+
+class NodeUnavailable(Exception):
+    pass
+
+class _Breaker:
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.state = "half_open"
+                self._probing = False
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def release(self):
+        with self._lock:
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.failures >= self.threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = max(0, int(self.cooldown - (time.monotonic() - self.opened_at))) if self.state == "open" else 0
+            return {"state": self.state, "failures": self.failures, "retry_in": retry_in}
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def _breaker(address):
+    key = address.rstrip("/")
+    with _breakers_lock:
+        b = _breakers.get(key)
+        if b is None:
+            b = _breakers[key] = _Breaker(int(os.getenv("XUI_BREAKER_THRESHOLD", "3")), float(os.getenv("XUI_BREAKER_COOLDOWN", "30")))
+        return b
+
+def breaker_state(address):
+    return _breaker(address).snapshot()
+
+def reset_breaker(address):
+    _breaker(address).success()
+
+def _find_client(inbound, email):
+    if not inbound:
+        return None
+    clients = json.loads(inbound.get("settings", "{}")).get("clients", [])
+    return next((c for c in clients if c.get("email") == email), None)
+
 class XUIClient:
     def __init__(self, address, username, password, proxy_url=None):
         self.base = address.rstrip("/")
         self.username = username
         self.password = password
+        self.calls = 0
         self.session = requests.Session()
         self.session.verify = False
         if proxy_url:
             self.session.proxies = {"http": proxy_url, "https": proxy_url}
         self._login()
 
+    def _request(self, method, path, timeout=10, **kwargs):
+        b = _breaker(self.base)
+        op = _op(path)
+        if not b.allow():
+            _xui_requests.inc(node=self.base, op=op, status="rejected")
+            raise NodeUnavailable(f"{self.base} is unreachable (circuit open)")
+        self.calls += 1
+        t0 = time.perf_counter()
+        try:
+            with tracing.span("xui", f"{op} {self.base}"):
+                r = self.session.request(method, f"{self.base}{path}", timeout=timeout, **kwargs)
+        except requests.RequestException:
+            b.failure()
+            _xui_requests.inc(node=self.base, op=op, status="error")
+            raise
+        except BaseException:
+            b.release()
+            raise
+        finally:
+            _xui_latency.observe(time.perf_counter() - t0, node=self.base, op=op)
+        if r.status_code >= 500:
+            b.failure()
+            _xui_requests.inc(node=self.base, op=op, status="error")
+        else:
+            b.success()
+            _xui_requests.inc(node=self.base, op=op, status="ok")
+        return r
+
     def _login(self):
-        self.session.post(f"{self.base}/login", json={"username": self.username, "password": self.password}, timeout=10)
+        self._request("POST", "/login", json={"username": self.username, "password": self.password})
 
     def get_inbound(self, inbound_id):
-        r = self.session.get(f"{self.base}/panel/api/inbounds/get/{inbound_id}", timeout=10)
+        r = self._request("GET", f"/panel/api/inbounds/get/{inbound_id}")
         data = r.json()
         return data.get("obj") if data.get("success") else None
 
     def add_client(self, inbound_id, client_obj):
         settings = json.dumps({"clients": [client_obj]})
-        r = self.session.post(f"{self.base}/panel/api/inbounds/addClient",
-            json={"id": inbound_id, "settings": settings}, timeout=10)
+        r = self._request("POST", "/panel/api/inbounds/addClient", json={"id": inbound_id, "settings": settings})
         return r.json().get("success", False)
 
     def update_client(self, inbound_id, client_uuid, client_obj):
         settings = json.dumps({"clients": [client_obj]})
-        r = self.session.post(f"{self.base}/panel/api/inbounds/updateClient/{client_uuid}",
-            json={"id": inbound_id, "settings": settings}, timeout=10)
+        r = self._request("POST", f"/panel/api/inbounds/updateClient/{client_uuid}", json={"id": inbound_id, "settings": settings})
         return r.json().get("success", False)
 
     def delete_client(self, inbound_id, client_uuid):
-        r = self.session.post(f"{self.base}/panel/api/inbounds/{inbound_id}/delClient/{client_uuid}", timeout=10)
+        r = self._request("POST", f"/panel/api/inbounds/{inbound_id}/delClient/{client_uuid}")
         return r.json().get("success", False)
 
     def get_client_traffic(self, email):
-        r = self.session.get(f"{self.base}/panel/api/inbounds/getClientTraffics/{email}", timeout=10)
+        r = self._request("GET", f"/panel/api/inbounds/getClientTraffics/{email}")
         data = r.json()
         return data.get("obj") if data.get("success") else None
 
     def get_client_by_email(self, inbound_id, email):
-        inbound = self.get_inbound(inbound_id)
-        if not inbound:
-            return None
-        clients = json.loads(inbound.get("settings", "{}")).get("clients", [])
-        return next((c for c in clients if c.get("email") == email), None)
+        return _find_client(self.get_inbound(inbound_id), email)
 
     def set_client_enabled(self, inbound_id, client_uuid, email, enabled):
         client = self.get_client_by_email(inbound_id, email)
@@ -58,7 +171,8 @@ class XUIClient:
         client["enable"] = enabled
         return self.update_client(inbound_id, client_uuid, client)
 
-    def make_client(self, email, client_uuid, expire_ms=0, ip_limit=0, sub_id="", comment="", total_limit_bytes=0):
+    @staticmethod
+    def make_client(email, client_uuid, expire_ms=0, ip_limit=0, sub_id="", comment="", total_limit_bytes=0):
         return {
             "id": client_uuid,
             "flow": "",
@@ -119,13 +233,13 @@ class XUIClient:
         return self.update_client(inbound_id, old_uuid, client)
 
     def reset_client_traffic(self, inbound_id, email):
-        r = self.session.post(f"{self.base}/panel/api/inbounds/{inbound_id}/resetClientTraffic/{email}", timeout=10)
+        r = self._request("POST", f"/panel/api/inbounds/{inbound_id}/resetClientTraffic/{email}")
         return r.json().get("success", False)
 
     def restart_xray(self):
         for path in ("/panel/api/server/restartXrayService", "/panel/api/inbounds/restartXrayService", "/panel/api/server/restartXray", "/panel/api/inbounds/restartXray"):
             try:
-                r = self.session.post(f"{self.base}{path}", timeout=15)
+                r = self._request("POST", path, timeout=15)
                 data = r.json()
                 if data.get("success"):
                     return True
@@ -139,3 +253,210 @@ class XUIClient:
             return True
         except Exception:
             return False
+
+_node_limits = weakref.WeakKeyDictionary()
+
+def _node_semaphore(address):
+    per_loop = _node_limits.setdefault(asyncio.get_running_loop(), {})
+    key = address.rstrip("/")
+    sem = per_loop.get(key)
+    if sem is None:
+        sem = per_loop[key] = asyncio.Semaphore(max(1, int(os.getenv("XUI_NODE_CONCURRENCY", "4"))))
+    return sem
+
+class AsyncXUIClient:
+    def __init__(self, address, username, password, proxy_url=None):
+        self.base = address.rstrip("/")
+        self.username = username
+        self.password = password
+        self.calls = 0
+        self.session = httpx.AsyncClient(verify=False, proxy=proxy_url or None, timeout=10)
+
+    @classmethod
+    async def connect(cls, address, username, password, proxy_url=None):
+        return await cls(address, username, password, proxy_url).__aenter__()
+
+    async def aclose(self):
+        await self.session.aclose()
+
+    async def __aenter__(self):
+        try:
+            await self._login()
+        except BaseException:
+            await self.aclose()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def _request(self, method, path, timeout=10, **kwargs):
+        b = _breaker(self.base)
+        op = _op(path)
+        async with _node_semaphore(self.base):
+            if not b.allow():
+                _xui_requests.inc(node=self.base, op=op, status="rejected")
+                raise NodeUnavailable(f"{self.base} is unreachable (circuit open)")
+            self.calls += 1
+            t0 = time.perf_counter()
+            try:
+                with tracing.span("xui", f"{op} {self.base}"):
+                    r = await self.session.request(method, f"{self.base}{path}", timeout=timeout, **kwargs)
+            except httpx.HTTPError:
+                b.failure()
+                _xui_requests.inc(node=self.base, op=op, status="error")
+                raise
+            except BaseException:
+                b.release()
+                raise
+            finally:
+                _xui_latency.observe(time.perf_counter() - t0, node=self.base, op=op)
+        if r.status_code >= 500:
+            b.failure()
+            _xui_requests.inc(node=self.base, op=op, status="error")
+        else:
+            b.success()
+            _xui_requests.inc(node=self.base, op=op, status="ok")
+        return r
+
+    async def _login(self):
+        await self._request("POST", "/login", json={"username": self.username, "password": self.password})
+
+    async def get_inbound(self, inbound_id):
+        r = await self._request("GET", f"/panel/api/inbounds/get/{inbound_id}")
+        data = r.json()
+        return data.get("obj") if data.get("success") else None
+
+    async def add_client(self, inbound_id, client_obj):
+        settings = json.dumps({"clients": [client_obj]})
+        r = await self._request("POST", "/panel/api/inbounds/addClient", json={"id": inbound_id, "settings": settings})
+        return r.json().get("success", False)
+
+    async def update_client(self, inbound_id, client_uuid, client_obj):
+        settings = json.dumps({"clients": [client_obj]})
+        r = await self._request("POST", f"/panel/api/inbounds/updateClient/{client_uuid}", json={"id": inbound_id, "settings": settings})
+        return r.json().get("success", False)
+
+    async def delete_client(self, inbound_id, client_uuid):
+        r = await self._request("POST", f"/panel/api/inbounds/{inbound_id}/delClient/{client_uuid}")
+        return r.json().get("success", False)
+
+    async def get_client_traffic(self, email):
+        r = await self._request("GET", f"/panel/api/inbounds/getClientTraffics/{email}")
+        data = r.json()
+        return data.get("obj") if data.get("success") else None
+
+    async def get_client_by_email(self, inbound_id, email):
+        return _find_client(await self.get_inbound(inbound_id), email)
+
+    async def set_client_enabled(self, inbound_id, client_uuid, email, enabled):
+        return await self.sync_client(inbound_id, client_uuid, email, enabled=enabled)
+
+    make_client = staticmethod(XUIClient.make_client)
+
+    async def update_client_expiry_ip(self, inbound_id, client_uuid, email, expire_ms, ip_limit):
+        return await self.sync_client(inbound_id, client_uuid, email, expire_ms=expire_ms, ip_limit=ip_limit)
+
+    async def update_client_limit(self, inbound_id, client_uuid, email, total_limit_bytes):
+        return await self.sync_client(inbound_id, client_uuid, email, total_limit_bytes=total_limit_bytes)
+
+    async def sync_client(self, inbound_id, client_uuid, email, enabled=None, expire_ms=None, ip_limit=None, total_limit_bytes=None):
+        client = await self.get_client_by_email(inbound_id, email)
+        if not client:
+            return False
+        if enabled is not None:
+            client["enable"] = enabled
+        if expire_ms is not None:
+            client["expiryTime"] = expire_ms
+        if ip_limit is not None:
+            client["limitIp"] = ip_limit
+        if total_limit_bytes is not None:
+            client["totalGB"] = total_limit_bytes
+        return await self.update_client(inbound_id, client_uuid, client)
+
+    async def update_client_email_subid(self, inbound_id, client_uuid, old_email, new_email, new_sub_id):
+        client = await self.get_client_by_email(inbound_id, old_email)
+        if not client:
+            return False
+        client["email"] = new_email
+        client["subId"] = new_sub_id
+        return await self.update_client(inbound_id, client_uuid, client)
+
+    async def rotate_client_uuid(self, inbound_id, old_uuid, email, new_uuid, enabled=None):
+        client = await self.get_client_by_email(inbound_id, email)
+        if not client:
+            return False
+        client["id"] = new_uuid
+        if enabled is not None:
+            client["enable"] = enabled
+        return await self.update_client(inbound_id, old_uuid, client)
+
+    async def reset_client_traffic(self, inbound_id, email):
+        r = await self._request("POST", f"/panel/api/inbounds/{inbound_id}/resetClientTraffic/{email}")
+        return r.json().get("success", False)
+
+    async def restart_xray(self):
+        for path in ("/panel/api/server/restartXrayService", "/panel/api/inbounds/restartXrayService", "/panel/api/server/restartXray", "/panel/api/inbounds/restartXray"):
+            try:
+                r = await self._request("POST", path, timeout=15)
+                if r.json().get("success"):
+                    return True
+            except Exception:
+                pass
+        return False
+
+    async def test_connection(self):
+        try:
+            await self._login()
+            return True
+        except Exception:
+            return False
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def _bridge_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="xui-async", daemon=True).start()
+            _loop = loop
+        return _loop
+
+async def add_clients_by_node(items):
+    by_node = {}
+    for i, (ni, client) in enumerate(items):
+        by_node.setdefault(ni["node_id"], []).append((i, ni, client))
+    results = [None] * len(items)
+    async def _node(group):
+        ni = group[0][1]
+        try:
+            async with AsyncXUIClient(ni["address"], ni["username"], ni["password"], ni.get("proxy_url")) as xui:
+                for i, ni, client in group:
+                    try:
+                        results[i] = await xui.add_client(ni["inbound_id"], client)
+                    except Exception as e:
+                        results[i] = e
+        except Exception as e:
+            for i, _, _ in group:
+                if results[i] is None:
+                    results[i] = e
+    await asyncio.gather(*[_node(g) for g in by_node.values()])
+    return results
+
+def run_async(coro, timeout=None):
+    loop = _bridge_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_async() called from the bridge loop; await the coroutine instead")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise